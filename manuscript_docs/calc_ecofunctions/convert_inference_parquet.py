@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+One-off conversion of every agile_outputs inference CSV (and each country's
+raw_file_list.csv) to Parquet.
+
+For each country, every '<sound>/<sound>_inference.csv' in agile_outputs gets a
+sibling '<sound>_inference.parquet' holding the filename and logit columns
+(ZSTD compressed), and raw_file_list.csv gets a raw_file_list.parquet holding
+its filename column. read_inference and read_raw_filenames in
+count_ecofunctions.py pick these up automatically while they are newer than the
+CSV, so re-run this script after regenerating any of the CSVs.
+"""
+
+import os
+import logging
+
+from count_ecofunctions import (
+    BASE_DIR,
+    COUNTRY_CONFIG,
+    list_sound_folders,
+    write_inference_parquet,
+    write_raw_filenames_parquet,
+)
+
+
+def convert_country(country: str) -> None:
+  """
+  Convert the raw file list and all inference CSVs in the agile_outputs folder for `country`.
+  """
+  raw_list_path = os.path.join(
+      BASE_DIR, "marrs_acoustics/data", f"output_dir_{country}", "raw_file_list.csv"
+  )
+  if os.path.isfile(raw_list_path):
+    parquet_path = write_raw_filenames_parquet(raw_list_path)
+    logging.info(f"Wrote {parquet_path}")
+  else:
+    logging.warning(f"raw_file_list.csv not found for {country}: {raw_list_path}")
+
+  agile_dir = os.path.join(
+      BASE_DIR, "marrs_acoustics/data", f"output_dir_{country}", "agile_outputs"
+  )
+  if not os.path.isdir(agile_dir):
+    logging.warning(f"No agile_outputs directory found for {country}: {agile_dir}")
+    return
+
+  for sound_folder in list_sound_folders(agile_dir):
+    csv_path = os.path.join(agile_dir, sound_folder, f"{sound_folder}_inference.csv")
+    parquet_path = write_inference_parquet(csv_path)
+    logging.info(f"Wrote {parquet_path}")
+
+
+def main() -> None:
+  """Convert inference CSVs for all countries."""
+  logging.basicConfig(level=logging.INFO)
+  for country in COUNTRY_CONFIG.keys():
+    logging.info(f"Converting inference CSVs for {country}...")
+    convert_country(country)
+
+
+if __name__ == "__main__":
+  main()
@@ -19,8 +19,21 @@ Steps:
 """
 
 import os
+import json
 import logging
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Callable
+import numba
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.dataset as ds
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
 
 # Global variables
 SOUND = "snaps" # set to 'scrape' or 'snaps'
@@ -39,6 +52,18 @@ COUNTRY_CONFIG = {
 }
 COUNTRIES = list(COUNTRY_CONFIG.keys())
 
+# Treatment code found at the 5th character of each filename.
+TREATMENT_CODES = {
+  "H": "healthy",
+  "D": "degraded",
+  "R": "restored",
+  "N": "newly_restored"
+}
+# Same lookup indexed by the ASCII byte value, for the batch parser below.
+TREATMENT_LUT = np.full(256, "unknown", dtype=object)
+for _code, _treatment in TREATMENT_CODES.items():
+  TREATMENT_LUT[ord(_code)] = _treatment
+
 BASE_DIR = os.getenv("BASE_DIR")
 if not BASE_DIR:
   raise ValueError("BASE_DIR environment variable is not set.")
@@ -59,16 +84,7 @@ def parse_treatment(filename_part: str) -> str:
   """
   if len(filename_part) <= 4:
     return "unknown"
-  char = filename_part[4]
-  if char == "H":
-    return "healthy"
-  if char == "D":
-    return "degraded"
-  if char == "R":
-    return "restored"
-  if char == "N":
-    return "newly_restored"
-  return "unknown"
+  return TREATMENT_CODES.get(filename_part[4], "unknown")
 
 def parse_site(filename_part: str) -> str:
   """
@@ -99,6 +115,423 @@ def parse_date_time(filename_part: str) -> datetime:
   dt_str = filename_part[7:7+15]  # '20220830_130600'
   return datetime.strptime(dt_str, "%Y%m%d_%H%M%S")
 
+@numba.njit(cache=True)
+def _copy_site_bytes(buf: np.ndarray, lengths: np.ndarray, sites: np.ndarray, found: np.ndarray) -> None:
+  """
+  For each row of `buf` (one encoded filename per row), copy the bytes between the
+  first and second underscore into `sites` and flag in `found` whether there was
+  an underscore at all. Mirrors parse_site.
+  """
+  for i in range(buf.shape[0]):
+    n_underscores = 0
+    k = 0
+    for j in range(lengths[i]):
+      c = buf[i, j]
+      if c == 95:  # "_"
+        n_underscores += 1
+        if n_underscores == 2:
+          break
+      elif n_underscores == 1 and k < sites.shape[1]:
+        sites[i, k] = c
+        k += 1
+    found[i] = n_underscores > 0
+
+@numba.njit(cache=True)
+def _decimal_hours(buf: np.ndarray, lengths: np.ndarray, out: np.ndarray) -> None:
+  """
+  For each row of `buf`, read the 'YYYYMMDD_HHMMSS' at byte offset 7 with integer
+  arithmetic and store the time of day in decimal hours in `out`, or NaN if it
+  is not a valid date and time. Mirrors parse_date_time without building datetimes.
+  """
+  days_in_month = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+  for i in range(buf.shape[0]):
+    out[i] = np.nan
+    if lengths[i] < 7+15 or buf[i, 7+8] != 95:  # "_"
+      continue
+    digits = np.empty(14, dtype=np.int64)
+    valid = True
+    for j in range(14):
+      c = buf[i, 7 + j + (j >= 8)]
+      if c < 48 or c > 57:
+        valid = False
+        break
+      digits[j] = c - 48
+    if not valid:
+      continue
+    year = digits[0]*1000 + digits[1]*100 + digits[2]*10 + digits[3]
+    month = digits[4]*10 + digits[5]
+    day = digits[6]*10 + digits[7]
+    hour = digits[8]*10 + digits[9]
+    minute = digits[10]*10 + digits[11]
+    second = digits[12]*10 + digits[13]
+    if month < 1 or month > 12 or hour > 23 or minute > 59 or second > 59:
+      continue
+    leap = (year % 4 == 0 and year % 100 != 0) or year % 400 == 0
+    if day < 1 or day > days_in_month[month - 1] + (month == 2 and leap):
+      continue
+    out[i] = (hour*3600 + minute*60 + second) / 3600
+
+def pack_ascii(filename_parts: np.ndarray):
+  """
+  Pack filename parts into a zero-padded uint8 array (one name per row, at least
+  7+15 bytes wide) for the nopython kernels. Return (buf, lengths), or None if
+  any name is not ASCII.
+  """
+  try:
+    encoded = np.char.encode(np.asarray(filename_parts, dtype=str), "ascii")
+  except UnicodeEncodeError:
+    return None
+  n = encoded.size
+  width = max(encoded.dtype.itemsize, 7+15)
+  buf = np.zeros((n, width), dtype=np.uint8)
+  if n:
+    buf[:, :encoded.dtype.itemsize] = encoded.view(np.uint8).reshape(n, -1)
+  return buf, np.char.str_len(encoded)
+
+def decimal_hours(filename_parts: np.ndarray) -> np.ndarray:
+  """
+  Batch time of day (decimal hours) from filename parts such as
+  'ind_D2_20220830_130600.WAV' -> 13.1. NaN where the datetime can't be parsed.
+  """
+  packed = pack_ascii(filename_parts)
+  if packed is None:
+    dt = pd.to_datetime(
+      pd.Series(filename_parts, dtype=str).str.slice(7, 7+15), format="%Y%m%d_%H%M%S", errors="coerce"
+    )
+    return ((dt - dt.dt.normalize()).dt.total_seconds() / 3600).to_numpy()
+  buf, lengths = packed
+  hours = np.empty(buf.shape[0], dtype=np.float64)
+  _decimal_hours(buf, lengths, hours)
+  return hours
+
+def parse_all(filename_parts: np.ndarray):
+  """
+  Batch version of parse_site, parse_date and parse_treatment over an array of
+  filename parts. Filenames are packed into a fixed-width uint8 array so the site
+  split runs in nopython mode; date and treatment are fixed-offset byte slices.
+  Return (sites, dates, treatments) as numpy arrays of str.
+  """
+  packed = pack_ascii(filename_parts)
+  if packed is None:
+    # Byte offsets only line up with character offsets for ASCII names
+    return (
+      np.array([parse_site(p) for p in filename_parts], dtype=str),
+      np.array([parse_date(p) for p in filename_parts], dtype=str),
+      np.array([parse_treatment(p) for p in filename_parts], dtype=object),
+    )
+  buf, lengths = packed
+  n, width = buf.shape
+
+  site_bytes = np.zeros((n, width), dtype=np.uint8)
+  found = np.zeros(n, dtype=np.bool_)
+  _copy_site_bytes(buf, lengths, site_bytes, found)
+  sites = np.char.decode(site_bytes.view(f"S{width}").ravel(), "ascii")
+  sites = np.where(found, sites, "unknown")
+
+  dates = np.char.decode(np.ascontiguousarray(buf[:, 7:7+8]).view("S8").ravel(), "ascii")
+  treatments = TREATMENT_LUT[buf[:, 4]]
+  return sites, dates, treatments
+
+def parse_filenames(filename_parts: pd.Series) -> pd.DataFrame:
+  """
+  Vectorized version of parse_site, parse_date and parse_treatment (see parse_all).
+  Return a DataFrame with columns: site, date, treatment (same index as the input).
+  """
+  sites, dates, treatments = parse_all(filename_parts.to_numpy())
+  return pd.DataFrame(
+    {"site": sites, "date": dates, "treatment": treatments},
+    index=filename_parts.index
+  )
+
+# Parsed filenames per country, indexed by filename part. Inference filenames are
+# a subset of the raw file list, so they are looked up here instead of re-parsed.
+_PARSED_FILENAMES: dict[str, pd.DataFrame] = {}
+
+def parse_filenames_cached(country: str, filename_parts: pd.Series) -> pd.DataFrame:
+  """
+  Like parse_filenames, but reuses results already parsed for `country`; only
+  filename parts not seen before are parsed (and added to the cache).
+  """
+  cache = _PARSED_FILENAMES.get(country)
+  unique_parts = pd.Index(filename_parts.unique())
+  missing = unique_parts if cache is None else unique_parts.difference(cache.index)
+  if cache is None or len(missing):
+    parsed = parse_filenames(pd.Series(missing, index=missing, dtype=str))
+    cache = parsed if cache is None else pd.concat([cache, parsed])
+    _PARSED_FILENAMES[country] = cache
+
+  df_parsed = cache.reindex(filename_parts.to_numpy())
+  df_parsed.index = filename_parts.index
+  return df_parsed
+
+def read_raw_filenames(raw_list_path: str) -> pd.Series:
+  """
+  Read only the 'filename' column of a raw_file_list.csv. The file is memory-mapped
+  and parsed with pyarrow's multithreaded CSV reader, or read from an up-to-date
+  Parquet copy if one exists (see write_raw_filenames_parquet).
+  """
+  return read_raw_filename_column(raw_list_path).to_pandas()
+
+def raw_list_parquet_path(raw_list_path: str) -> str:
+  """
+  Path of the Parquet copy of a raw file list, e.g.
+  'output_dir_kenya/raw_file_list.csv' -> 'output_dir_kenya/raw_file_list.parquet'.
+  """
+  return os.path.splitext(raw_list_path)[0] + ".parquet"
+
+def read_raw_filename_column(raw_list_path: str) -> pa.ChunkedArray:
+  """Arrow column behind read_raw_filenames, for callers that transform it before pandas."""
+  parquet_path = raw_list_parquet_path(raw_list_path)
+  if os.path.isfile(parquet_path) and os.path.getmtime(parquet_path) >= os.path.getmtime(raw_list_path):
+    return pq.read_table(parquet_path, columns=["filename"]).column("filename")
+
+  with pa.memory_map(raw_list_path) as source:
+    table = pacsv.read_csv(
+      source,
+      read_options=pacsv.ReadOptions(use_threads=True),
+      convert_options=pacsv.ConvertOptions(
+        include_columns=["filename"], column_types={"filename": pa.string()}
+      ),
+    )
+  return table.column("filename")
+
+def write_raw_filenames_parquet(raw_list_path: str) -> str:
+  """
+  Write the filename column of a raw_file_list.csv to a sibling Parquet file
+  (ZSTD compressed) so read_raw_filenames can skip CSV parsing. Return its path.
+  """
+  parquet_path = raw_list_parquet_path(raw_list_path)
+  table = pa.table({"filename": read_raw_filename_column(raw_list_path)})
+  pq.write_table(table, parquet_path, compression="zstd")
+  return parquet_path
+
+def read_raw_filename_parts(raw_list_path: str) -> pd.Series:
+  """
+  Like read_raw_filenames, but return the filename parts (no directory). The
+  directory is stripped in Arrow, so full paths are never converted to pandas.
+  """
+  filenames = read_raw_filename_column(raw_list_path)
+  return pc.replace_substring_regex(filenames, pattern="^.*/", replacement="").to_pandas()
+
+def build_filename_index(country: str) -> pd.DataFrame:
+  """
+  Parse every filename in the country's raw_file_list.csv once, so the same
+  filenames don't need re-parsing for every sound's inference CSV.
+  Return a DataFrame indexed by filename part (no directory) with columns:
+  site, date, treatment, time (decimal hour of day).
+  """
+  raw_list_path = os.path.join(
+    BASE_DIR,
+    "marrs_acoustics/data",
+    f"output_dir_{country}",
+    "raw_file_list.csv"
+  )
+  if not os.path.isfile(raw_list_path):
+    logging.warning(f"raw_file_list.csv not found for {country}. Path: {raw_list_path}")
+    return pd.DataFrame(columns=["site", "date", "treatment", "time"])
+
+  filenames = read_raw_filenames(raw_list_path)
+  filename_parts = filenames.str.rsplit("/", n=1).str[-1].drop_duplicates()
+  df_index = parse_filename_index(filename_parts)
+
+  parsed = df_index["time"].notna().to_numpy()
+  n_bad = int((~parsed).sum())
+  if n_bad:
+    logging.error(f"Could not parse datetime from {n_bad} filenames for {country}.")
+  return df_index[parsed]
+
+def parse_filename_index(filename_parts: pd.Series) -> pd.DataFrame:
+  """
+  Parse distinct filename parts into a DataFrame indexed by filename part with
+  columns: site, date, treatment, time (NaN where the datetime can't be parsed).
+  """
+  df_index = parse_filenames(filename_parts)
+  df_index["time"] = decimal_hours(filename_parts.to_numpy())
+  df_index.index = pd.Index(filename_parts, name="filename_part")
+  return df_index
+
+def match_filename_index(
+  filename_parts: pd.Series, valid_index: pd.DataFrame, valid_pairs: pd.MultiIndex
+) -> tuple[pd.DataFrame, int]:
+  """
+  Look up site, date, treatment and time for each of `filename_parts` (in order)
+  in `valid_index`, a build_filename_index frame restricted to `valid_pairs`.
+  Names not in the index (e.g. missing from raw_file_list) are parsed directly,
+  so their detections still count if they fall on a valid site-date pair.
+  Return (records, n_parsed): the matched rows, and how many of them were parsed
+  rather than found in the index.
+  """
+  records = valid_index.reindex(filename_parts.to_numpy()).reset_index(drop=True)
+  unmatched = records["time"].isna().to_numpy()
+  n_parsed = 0
+  if unmatched.any():
+    parsed = parse_filename_index(pd.Series(filename_parts[unmatched].unique(), dtype=str))
+    on_valid = pd.MultiIndex.from_frame(parsed[["site", "date"]]).isin(valid_pairs)
+    parsed = parsed[on_valid & parsed["time"].notna().to_numpy()]
+    if not parsed.empty:
+      fallback = parsed.reindex(filename_parts.to_numpy()).reset_index(drop=True)
+      n_parsed = int(fallback["time"].notna().sum())
+      records = records.fillna(fallback)
+  return records[records["time"].notna().to_numpy()].reset_index(drop=True), n_parsed
+
+
+# Sound folder listings are cached here (see list_sound_folders), outside the input data tree
+SOUND_MANIFEST_DIR = os.path.join(BASE_DIR, "marrs_acoustics/data/results/cache")
+
+def list_sound_folders(agile_dir: str) -> list[str]:
+  """
+  Return the names of the sound subfolders of `agile_dir` that contain a
+  '<sound>_inference.csv', sorted by name.
+
+  The listing is cached in a JSON manifest under SOUND_MANIFEST_DIR together with
+  the folder's mtime and each CSV's mtime; while those still match, the cached
+  list is used instead of scanning every subfolder again.
+  """
+  agile_dir = os.path.abspath(agile_dir)
+  manifest_path = os.path.join(
+    SOUND_MANIFEST_DIR, f"{os.path.basename(os.path.dirname(agile_dir))}_sounds.json"
+  )
+  # Taken before the scan: a sound folder added or removed during or after the
+  # scan moves the folder's mtime past this value, so the manifest goes stale
+  dir_mtime = os.stat(agile_dir).st_mtime
+
+  def csv_mtime(sound: str):
+    try:
+      return os.stat(os.path.join(agile_dir, sound, f"{sound}_inference.csv")).st_mtime
+    except FileNotFoundError:
+      return None
+
+  try:
+    with open(manifest_path) as f:
+      manifest = json.load(f)
+    if manifest["agile_dir"] == agile_dir and manifest["dir_mtime"] == dir_mtime and all(
+      csv_mtime(sound) == mtime for sound, mtime in manifest["sounds"].items()
+    ):
+      return [sound for sound, mtime in manifest["sounds"].items() if mtime is not None]
+  except (OSError, ValueError, KeyError):
+    pass
+
+  with os.scandir(agile_dir) as it:
+    folders = sorted(entry.name for entry in it if entry.is_dir())
+  sounds = {sound: csv_mtime(sound) for sound in folders}
+  for sound, mtime in sounds.items():
+    if mtime is None:
+      logging.info(f"No inference CSV found for sound folder {sound} in {agile_dir}.")
+
+  # Written whole under a temporary name and renamed into place, so another run
+  # never reads a partial manifest
+  tmp_path = f"{manifest_path}.{os.getpid()}.tmp"
+  try:
+    os.makedirs(SOUND_MANIFEST_DIR, exist_ok=True)
+    with open(tmp_path, "w") as f:
+      json.dump({"agile_dir": agile_dir, "dir_mtime": dir_mtime, "sounds": sounds}, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+  except OSError as e:
+    logging.warning(f"Could not write sound folder manifest {manifest_path}: {e}")
+    if os.path.exists(tmp_path):
+      os.remove(tmp_path)
+
+  return [sound for sound, mtime in sounds.items() if mtime is not None]
+
+def inference_parquet_path(csv_path: str) -> str:
+  """
+  Path of the Parquet copy of an inference CSV, e.g.
+  'creek/creek_inference.csv' -> 'creek/creek_inference.parquet'.
+  """
+  return os.path.splitext(csv_path)[0] + ".parquet"
+
+def read_inference_table(csv_path: str, logit_cutoff: float = LOGIT_CUTOFF) -> pa.Table:
+  """
+  Read an agile_outputs inference file into an Arrow table with columns
+  filename, logit (header whitespace stripped), keeping only rows with
+  logit >= logit_cutoff.
+
+  If an up-to-date Parquet copy exists (see convert_inference_parquet.py) it is
+  scanned with column and predicate pushdown; otherwise the CSV is scanned as a
+  pyarrow dataset, parsing only the two needed columns and filtering each batch
+  as it is read, so rows below the cutoff are never collected into a table.
+  """
+  parquet_path = inference_parquet_path(csv_path)
+  if os.path.isfile(parquet_path) and os.path.getmtime(parquet_path) >= os.path.getmtime(csv_path):
+    return ds.dataset(parquet_path).to_table(
+      columns=["filename", "logit"], filter=pc.field("logit") >= logit_cutoff
+    )
+
+  # The logit column is written as " logit" (leading space) by the inference step
+  header = pd.read_csv(csv_path, nrows=0).columns
+  filename_col = next(c for c in header if c.strip() == "filename")
+  logit_col = next(c for c in header if c.strip() == "logit")
+  csv_format = ds.CsvFileFormat(
+    convert_options=pacsv.ConvertOptions(column_types={logit_col: pa.float32()})
+  )
+  table = ds.dataset(csv_path, format=csv_format).to_table(
+    columns=[filename_col, logit_col], filter=pc.field(logit_col) >= logit_cutoff
+  )
+  return table.rename_columns(["filename", "logit"])
+
+def read_inference(
+  csv_path: str, logit_cutoff: float = LOGIT_CUTOFF, columns: list[str] | None = None
+) -> pd.DataFrame:
+  """
+  Read, filter and split an inference file in one Arrow pipeline (see
+  read_inference_table). Return a DataFrame with columns: filename, logit,
+  filename_part (the filename without its directory), or only `columns` if given
+  (the others are then never converted to pandas).
+  """
+  table = read_inference_table(csv_path, logit_cutoff)
+  filename_parts = pc.replace_substring_regex(table.column("filename"), pattern="^.*/", replacement="")
+  table = table.append_column("filename_part", filename_parts)
+  if columns is not None:
+    table = table.select(columns)
+  return table.to_pandas()
+
+def write_inference_parquet(csv_path: str) -> str:
+  """
+  Write the filename and logit columns of an inference CSV to a sibling Parquet
+  file (ZSTD compressed) so read_inference can skip CSV parsing. Return its path.
+  """
+  parquet_path = inference_parquet_path(csv_path)
+  pq.write_table(read_inference_table(csv_path, logit_cutoff=-np.inf), parquet_path, compression="zstd")
+  return parquet_path
+
+def read_cached_frame(cache_path: str, source_path: str, key: str = "") -> pd.DataFrame | None:
+  """
+  Return the DataFrame stored in the feather file `cache_path` if it was built
+  from the current version of `source_path` with the same `key` (both recorded
+  in the file's metadata by write_cached_frame), otherwise None.
+  """
+  try:
+    table = feather.read_table(cache_path)
+  except (OSError, pa.ArrowInvalid):
+    return None
+  metadata = table.schema.metadata or {}
+  if (metadata.get(b"source_mtime") != repr(os.path.getmtime(source_path)).encode()
+      or metadata.get(b"cache_key") != key.encode()):
+    return None
+  return table.to_pandas()
+
+def write_cached_frame(df: pd.DataFrame, cache_path: str, source_path: str, key: str = "") -> None:
+  """
+  Store `df` in the feather file `cache_path`, with the mtime of the `source_path`
+  it was computed from and `key` (the parameters it depends on) in its metadata.
+  The file is written under a temporary name and renamed into place, so another
+  script reading the cache never sees a partial file. The cache is optional: if
+  it can't be written (e.g. a read-only data folder) a warning is logged.
+  """
+  table = pa.Table.from_pandas(df.reset_index(drop=True), preserve_index=False)
+  table = table.replace_schema_metadata({
+    **(table.schema.metadata or {}),
+    b"source_mtime": repr(os.path.getmtime(source_path)).encode(),
+    b"cache_key": key.encode(),
+  })
+  tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+  try:
+    feather.write_feather(table, tmp_path)
+    os.replace(tmp_path, cache_path)
+  except OSError as e:
+    logging.warning(f"Could not write cache {cache_path}: {e}")
+    if os.path.exists(tmp_path):
+      os.remove(tmp_path)
 
 def get_expected_daily_recordings(duty_cycle: int) -> int:
   """
@@ -109,12 +542,187 @@ def get_expected_daily_recordings(duty_cycle: int) -> int:
   minutes_per_day = 24 * 60
   return int(minutes_per_day / duty_cycle)
 
+def align_categories(left: pd.DataFrame, right: pd.DataFrame, columns: list) -> None:
+  """
+  Convert `columns` of both frames (in place) to categoricals sharing the same,
+  sorted categories, so a merge on them can join on the integer codes.
+  """
+  for col in columns:
+    # Index.union (sorted) also copes with an empty, object-typed side
+    categories = left[col].astype("category").cat.categories.union(
+      right[col].astype("category").cat.categories
+    )
+    left[col] = pd.Categorical(left[col], categories=categories)
+    right[col] = pd.Categorical(right[col], categories=categories)
+
+# Kernel density estimation for the temporal scripts
+SMOOTHING = 0.5  # Smoothing factor for kernel density estimation
+
+# Grid for the 24-hour period, shared by every kernel
+TIME_GRID = np.linspace(0, 24, 240)
+GRID_STEP = TIME_GRID[1] - TIME_GRID[0]
+# Histogram bins centred on the grid points, and grid-point offsets for the kernel
+GRID_BIN_EDGES = np.append(TIME_GRID - GRID_STEP / 2, TIME_GRID[-1] + GRID_STEP / 2)
+KERNEL_OFFSETS = np.arange(1 - TIME_GRID.size, TIME_GRID.size) * GRID_STEP
+
+def kde_1d(times: np.ndarray) -> np.ndarray | None:
+  """
+  Gaussian kernel density of `times` evaluated on TIME_GRID, or None if there
+  are fewer than two distinct times to estimate a bandwidth from.
+  Times are binned onto the grid and convolved once with a Gaussian kernel
+  via FFT. The bandwidth follows gaussian_kde(bw_method=SMOOTHING), i.e.
+  SMOOTHING * std(times), so results match it up to the grid resolution.
+  """
+  # Only the temporal scripts need scipy, so it isn't imported at module level
+  from scipy.signal import fftconvolve
+
+  if times.size < 2:
+    return None
+  bandwidth = SMOOTHING * np.std(times, ddof=1)
+  if not bandwidth > 0:
+    return None
+  counts, _ = np.histogram(times, bins=GRID_BIN_EDGES)
+  kernel = np.exp(-0.5 * (KERNEL_OFFSETS / bandwidth) ** 2) / (bandwidth * np.sqrt(2 * np.pi))
+  return fftconvolve(counts, kernel, mode="same") / times.size
+
+# One Figure per (worker) process, cleared and reused for every sound's plot
+_FIGURE = None
+
+def get_plot_axes():
+  """
+  Return this process's reusable (Figure, Axes) pair with the axes cleared,
+  creating it on first use.
+  """
+  # pyplot is only needed by the plotting scripts, which choose the backend first
+  import matplotlib.pyplot as plt
+
+  global _FIGURE
+  if _FIGURE is None:
+    _FIGURE = plt.subplots(figsize=(8, 6))
+  fig, ax = _FIGURE
+  ax.cla()
+  return fig, ax
+
+# Latest (country, filename index, valid site-date pairs) loaded by this worker
+# process; see run_sound_workers
+_SOUND_LOOKUP: tuple[str, pd.DataFrame, pd.MultiIndex] | None = None
+
+def write_sound_lookup(
+  lookup_dir: str, country: str, valid_index: pd.DataFrame, valid_pairs: pd.MultiIndex
+) -> None:
+  """
+  Save a country's filename index (restricted to valid site-date pairs) and
+  those pairs as Feather files in `lookup_dir`, for load_sound_lookup.
+  """
+  valid_index.reset_index().to_feather(os.path.join(lookup_dir, f"{country}_index.feather"))
+  valid_pairs.to_frame(index=False).to_feather(os.path.join(lookup_dir, f"{country}_pairs.feather"))
+
+def load_sound_lookup(country: str, lookup_dir: str) -> tuple[pd.DataFrame, pd.MultiIndex]:
+  """
+  Return (valid_index, valid_pairs) for `country` as saved by write_sound_lookup.
+  Only the latest country is kept in memory; tasks arrive country by country,
+  so each worker reads a country's files about once.
+  """
+  global _SOUND_LOOKUP
+  if _SOUND_LOOKUP is None or _SOUND_LOOKUP[0] != country:
+    valid_index = pd.read_feather(os.path.join(lookup_dir, f"{country}_index.feather"))
+    valid_pairs = pd.read_feather(os.path.join(lookup_dir, f"{country}_pairs.feather"))
+    _SOUND_LOOKUP = (
+      country, valid_index.set_index("filename_part"), pd.MultiIndex.from_frame(valid_pairs)
+    )
+  return _SOUND_LOOKUP[1], _SOUND_LOOKUP[2]
+
+def load_sound_detections(country: str, sound_folder: str, lookup_dir: str) -> pd.DataFrame | None:
+  """
+  Read one sound's inference CSV (logit >= LOGIT_CUTOFF) and return the treatment
+  and time of each detection on a valid site-date pair, looked up in the country's
+  filename index from `lookup_dir`. Return None, after logging why, if there are none.
+  """
+  agile_dir = os.path.join(BASE_DIR, "marrs_acoustics/data", f"output_dir_{country}", "agile_outputs")
+  csv_path = os.path.join(agile_dir, sound_folder, f"{sound_folder}_inference.csv")
+  if not os.path.isfile(csv_path):
+    logging.info(f"No CSV found for sound {sound_folder} in {country}. Skipping.")
+    return None
+
+  logging.info(f"Processing sound: {sound_folder} in {country}")
+  try:
+    df_infer = read_inference(csv_path, logit_cutoff=LOGIT_CUTOFF)
+  except Exception as e:
+    logging.error(f"Error reading CSV for sound {sound_folder} in {country}: {e}")
+    return None
+
+  if df_infer.empty:
+    logging.info(f"No detections for sound {sound_folder} in {country} after logit filtering.")
+    return None
+
+  # Look up site/date/treatment/time from the pre-parsed filename index
+  valid_index, valid_pairs = load_sound_lookup(country, lookup_dir)
+  df_records, n_parsed = match_filename_index(df_infer["filename_part"], valid_index, valid_pairs)
+  if n_parsed:
+    logging.warning(
+      f"{n_parsed} detections of sound {sound_folder} in {country} have filenames "
+      "missing from raw_file_list; parsed them directly."
+    )
+  if df_records.empty:
+    logging.info(f"No valid detections for sound {sound_folder} in {country} on valid site-date pairs.")
+    return None
+  return df_records[["treatment", "time"]]
+
+def run_sound_workers(
+  process_sound: Callable[[str, str, str], None],
+  valid_site_dates: Callable[[str], pd.MultiIndex],
+  max_workers: int | None = None,
+) -> None:
+  """
+  Call process_sound(country, sound_folder, lookup_dir) for each sound folder of
+  every country with coverage-passing site-date pairs (valid_site_dates(country)),
+  on one process pool for the whole run.
+
+  Each country's filename index, restricted to those pairs, is written once to a
+  scratch folder (lookup_dir) and read by each worker when it first needs it (see
+  load_sound_detections), so tasks carry only names rather than the index itself.
+  Tasks for one country run while the next country's index is being built.
+  """
+  with tempfile.TemporaryDirectory(prefix="sound_lookups_") as lookup_dir, \
+       ProcessPoolExecutor(max_workers=max_workers) as executor:
+    futures = []
+    for country in COUNTRY_CONFIG:
+      logging.info(f"Processing country: {country}")
+      valid_pairs = valid_site_dates(country)
+      if valid_pairs.empty:
+        logging.info(f"No site-date pairs with sufficient coverage for {country}. Skipping.")
+        continue
+      agile_dir = os.path.join(BASE_DIR, "marrs_acoustics/data", f"output_dir_{country}", "agile_outputs")
+      if not os.path.isdir(agile_dir):
+        logging.warning(f"Agile outputs directory not found for {country}: {agile_dir}")
+        continue
+
+      # Restrict the filename index to valid site-date pairs once for all sounds
+      filename_index = build_filename_index(country)
+      valid_mask = pd.MultiIndex.from_frame(filename_index[["site", "date"]]).isin(valid_pairs)
+      write_sound_lookup(lookup_dir, country, filename_index[valid_mask], valid_pairs)
+      futures += [
+        executor.submit(process_sound, country, sound_folder, lookup_dir)
+        for sound_folder in list_sound_folders(agile_dir)
+      ]
+    for future in futures:
+      future.result()
+
+# Coverage-passing combos per country. The raw file list is the same for every
+# sound, so it is read and parsed once per country and process.
+_RAW_FILE_LISTS: dict[str, pd.DataFrame] = {}
+
 def load_raw_file_list(country: str) -> pd.DataFrame:
   """
   Load and parse the raw_file_list.csv for the given country.
   Return a DataFrame of unique combos: country, site, date, treatment.
   Exclude any site–date combos that have <90% of the expected file count.
+  Results are cached per country; each call returns a copy the caller may modify.
   """
+  cached = _RAW_FILE_LISTS.get(country)
+  if cached is not None:
+    return cached.copy()
+
   raw_list_path = os.path.join(
     BASE_DIR,
     "marrs_acoustics/data",
@@ -126,21 +734,19 @@ def load_raw_file_list(country: str) -> pd.DataFrame:
     logging.warning(f"raw_file_list.csv not found for {country}. Path: {raw_list_path}")
     return pd.DataFrame(columns=["country", "site", "date", "treatment"])
 
-  df_raw = pd.read_csv(raw_list_path)
-  rows = []
-  for _, row in df_raw.iterrows():
-    filename_full = row["filename"]
-    filename_part = filename_full.split("/", 1)[-1] if "/" in filename_full else filename_full
-
-    treatment = parse_treatment(filename_part)
-    site = parse_site(filename_part)
-    date_str = parse_date(filename_part)
-
-    rows.append((country, site, date_str, treatment))
-
-  df_out = pd.DataFrame(rows, columns=["country", "site", "date", "treatment"])
+  # Only the filename column is needed. Parse each distinct filename once, keeping
+  # how many rows it had so coverage still counts every row.
+  filename_parts = read_raw_filenames(raw_list_path).str.rsplit("/", n=1).str[-1]
+  file_rows = filename_parts.value_counts(sort=False)
+  df_out = parse_filenames_cached(country, pd.Series(file_rows.index))
+  df_out.insert(0, "country", country)
+  df_out["n_rows"] = file_rows.to_numpy()
   # Count how many files (rows) per site–date
-  df_counts = df_out.groupby(["site", "date"]).size().reset_index(name="n_files")
+  df_counts = (
+    df_out.groupby(["site", "date"], sort=False)["n_rows"].sum()
+    .rename("n_files")
+    .reset_index()
+  )
 
   duty_cycle = COUNTRY_CONFIG[country]["duty_cycle"]
   expected_daily = get_expected_daily_recordings(duty_cycle)
@@ -149,22 +755,20 @@ def load_raw_file_list(country: str) -> pd.DataFrame:
   # Identify insufficient coverage
   insufficient = df_counts[df_counts["n_files"] < coverage_threshold]
   if not insufficient.empty:
-    for _, row_ex in insufficient.iterrows():
+    for row_ex in insufficient.itertuples(index=False):
       logging.info(
-        f"Excluding {country}, site={row_ex['site']}, date={row_ex['date']} "
-        f"(only {row_ex['n_files']} of {expected_daily} expected)"
+        f"Excluding {country}, site={row_ex.site}, date={row_ex.date} "
+        f"(only {row_ex.n_files} of {expected_daily} expected)"
       )
 
-  # Keep only combos above threshold
-  df_counts = df_counts[df_counts["n_files"] >= coverage_threshold]
-
-  # Merge back so only site–date combos above coverage remain
-  df_valid = pd.merge(
-    df_out, df_counts[["site", "date"]], on=["site", "date"], how="inner"
-  )
-  df_valid.drop_duplicates(inplace=True)
+  # Keep only rows whose site–date is above threshold (per-row group size, no merge back)
+  n_files = df_out.groupby(["site", "date"], sort=False)["n_rows"].transform("sum")
+  df_valid = df_out.loc[
+    n_files >= coverage_threshold, ["country", "site", "date", "treatment"]
+  ].drop_duplicates(ignore_index=True)
 
-  return df_valid
+  _RAW_FILE_LISTS[country] = df_valid
+  return df_valid.copy()
 
 def load_inference_counts(country: str, sound: str, logit_cutoff: float) -> pd.DataFrame:
   """
@@ -184,30 +788,20 @@ def load_inference_counts(country: str, sound: str, logit_cutoff: float) -> pd.D
     logging.warning(f"CSV does not exist for {country}, {sound}. Tried: {csv_path}")
     return pd.DataFrame(columns=["country", "site", "date", "treatment", "count"])
 
-  df_infer = pd.read_csv(csv_path)
-  # Filter out rows with logit < logit_cutoff, BEWARE OF LEADING SPACE
-  df_infer = df_infer[df_infer[" logit"] >= logit_cutoff]
-
-  rows = []
-  for _, row in df_infer.iterrows():
-    filename_full = row["filename"]
-    filename_part = filename_full.split("/", 1)[-1] if "/" in filename_full else filename_full
-
-    treatment = parse_treatment(filename_part)
-    site = parse_site(filename_part)
-    date_str = parse_date(filename_part)
-
-    rows.append((country, site, date_str, treatment))
+  # Reads only filename and logit with pyarrow and drops rows with logit < logit_cutoff
+  df_infer = read_inference(csv_path, logit_cutoff)
 
-  df_temp = pd.DataFrame(rows, columns=["country", "site", "date", "treatment"])
+  # Parse the whole filename column at once
+  df_temp = parse_filenames_cached(country, df_infer["filename_part"])
+  df_temp.insert(0, "country", country)
   df_counts = (
-    df_temp.groupby(["country", "site", "date", "treatment"], as_index=False)
-    .size()
-    .rename(columns={"size": "count"})
+    df_temp.value_counts(["country", "site", "date", "treatment"], sort=False)
+    .rename("count")
+    .reset_index()
   )
 
   duty_cycle = COUNTRY_CONFIG[country]["duty_cycle"]
-  df_counts["count"] = df_counts["count"] * duty_cycle
+  df_counts["count"] *= duty_cycle
 
   return df_counts
 
@@ -217,6 +811,7 @@ def process_country(country: str, sound: str, logit_cutoff: float) -> pd.DataFra
   2) Load inference counts -> (country, site, date, treatment, count).
   3) Merge raw combos with counts (left join), fill missing counts with 0.
   """
+  logging.info(f"Processing {country}...")
   df_raw_combos = load_raw_file_list(country)
   df_infer_counts = load_inference_counts(country, sound, logit_cutoff)
 
@@ -236,13 +831,13 @@ def main() -> None:
   """
   logging.basicConfig(level=logging.INFO)
 
-  combined_df = pd.DataFrame(columns=["country", "site", "date", "treatment", "count"])
+  # Countries are independent, so process them in parallel.
+  # Collect the per-country frames and concatenate once.
+  with ProcessPoolExecutor(max_workers=len(COUNTRIES)) as executor:
+    worker = partial(process_country, sound=SOUND, logit_cutoff=LOGIT_CUTOFF)
+    frames = list(executor.map(worker, COUNTRIES))
+  combined_df = pd.concat(frames, ignore_index=True)
 
-  for country in COUNTRIES:
-    logging.info(f"Processing {country}...")
-    df_country = process_country(country, SOUND, LOGIT_CUTOFF)
-    combined_df = pd.concat([combined_df, df_country], ignore_index=True)
-  
   # Sort and write CSV
   combined_df.sort_values(["country", "treatment", "site", "date"], inplace=True)
   combined_df.to_csv(OUTPUT_PATH, index=False)
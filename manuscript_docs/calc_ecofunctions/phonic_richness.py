@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 """
-Produce a CSV of 'phonic richness' (number of unique sounds per date/site).
+Produce a table of 'phonic richness' (number of unique sounds per date/site).
 
 Steps:
 1. For each country, load its raw_file_list.csv (as done before):
@@ -28,28 +28,35 @@ Steps:
    - Fill missing counts with 0 if no sounds were present.
 
 5. Append across all countries, sort, and save as phonic_richness.csv.
+   Pass --parquet to also write phonic_richness.parquet (ZSTD).
 """
 
 import os
+import argparse
 import logging
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import numba
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 
 # We'll reuse many of the functions and variables from 'combine_counts.py'.
-# For example, parse_date, parse_site, parse_treatment, etc.
+# For example, parse_all, read_inference, etc.
 # Make sure this script is in the same folder so the import works.
 from count_ecofunctions import (
     BASE_DIR,
     COUNTRY_CONFIG,
     FILE_COVERAGE,
     LOGIT_CUTOFF,
-    parse_date,
-    parse_site,
-    parse_treatment,
+    parse_all,
+    read_inference,
+    list_sound_folders,
     load_raw_file_list,  # We'll reuse this for coverage checks
+    align_categories,
 )
 
-# A new output CSV
+# Output table; a Parquet copy with the same name is written when --parquet is passed
 OUTPUT_RICHNESS_PATH = os.path.join(
     BASE_DIR,
     "marrs_acoustics/data/results/functions",
@@ -65,9 +72,10 @@ def gather_sound_presence(country: str, logit_cutoff: float = 1.0) -> pd.DataFra
       - Keep only rows with logit >= logit_cutoff
       - Extract site, date (with offset), treatment
       - Each site/date that appears => that sound is 'present' for that site/date/treatment
-  Return a DataFrame of columns: [country, site, date, treatment, sound]
+  Return a DataFrame of columns: [country, site, date, treatment, sound],
+  with each combination appearing once.
   """
-  presence_rows = []
+  presence_frames = []
 
   # Agile outputs path for this country
   country_agile_dir = os.path.join(
@@ -81,53 +89,66 @@ def gather_sound_presence(country: str, logit_cutoff: float = 1.0) -> pd.DataFra
     logging.warning(f"No agile_outputs directory found for {country}: {country_agile_dir}")
     return pd.DataFrame(columns=["country", "site", "date", "treatment", "sound"])
 
-  # Each subfolder is a potential sound name
-  for sound_folder in os.listdir(country_agile_dir):
-    # Full path to subfolder
-    folder_path = os.path.join(country_agile_dir, sound_folder)
-    # We only want folders (sometimes there might be stray files)
-    if not os.path.isdir(folder_path):
-      continue
-
+  # Each subfolder with an inference CSV (e.g. 'creek/creek_inference.csv') is a sound
+  for sound_folder in list_sound_folders(country_agile_dir):
     # Skip if the folder is 'snap'
     if sound_folder.lower() == "snap":
       logging.info(f"Not using: {sound_folder}")
       continue
 
-    # The inference CSV should be e.g. 'creek_inference.csv' in that folder
-    csv_path = os.path.join(folder_path, f"{sound_folder}_inference.csv")
-    if not os.path.isfile(csv_path):
-      logging.info(f"Not using: {sound_folder} (no CSV found).")
-      continue
+    csv_path = os.path.join(country_agile_dir, sound_folder, f"{sound_folder}_inference.csv")
 
     # If we get here, we have a valid CSV => parse it
     logging.info(f"Using: {sound_folder}")
-    df_infer = pd.read_csv(csv_path)
-
-    # Filter out rows with logit < 1.0 (beware of possible leading space in the column name)
-    # Adjust as needed if your column is truly " logit" or "logit".
-    # Below assumes " logit" just like in the original script:
-    df_infer = df_infer[df_infer[" logit"] >= logit_cutoff]
-
-    for _, row_inf in df_infer.iterrows():
-      filename_full = row_inf["filename"]
-      filename_part = filename_full.split("/", 1)[-1] if "/" in filename_full else filename_full
-
-      treatment = parse_treatment(filename_part)
-      site = parse_site(filename_part)
-      date_str = parse_date(filename_part)
-
-      # Each row => this (sound_folder) is present at site/date/treatment
-      presence_rows.append((country, site, date_str, treatment, sound_folder))
+    # Only rows with logit >= logit_cutoff are returned
+    df_infer = read_inference(csv_path, logit_cutoff)
+
+    # Presence only depends on which files had a detection, so reduce to the
+    # distinct filenames, parse those once and keep each site/date/treatment once.
+    sites, dates, treatments = parse_all(df_infer["filename_part"].unique())
+
+    # Each row => this (sound_folder) is present at site/date/treatment
+    presence_frames.append(pd.DataFrame({
+        "country": country,
+        "site": sites,
+        "date": dates,
+        "treatment": treatments,
+        "sound": sound_folder,
+    }).drop_duplicates(ignore_index=True))
 
   # Build and return
-  df_presence = pd.DataFrame(
-      presence_rows,
-      columns=["country", "site", "date", "treatment", "sound"]
-  )
+  if not presence_frames:
+    return pd.DataFrame(columns=["country", "site", "date", "treatment", "sound"])
+  df_presence = pd.concat(presence_frames, ignore_index=True)
+  # Low-cardinality keys => categorical codes for cheaper hashing in groupby/merge
+  for col in ["country", "site", "treatment", "sound"]:
+    df_presence[col] = df_presence[col].astype("category")
   return df_presence
 
 
+@numba.njit(cache=True)
+def count_unique_sounds(group_ids: np.ndarray, sound_codes: np.ndarray, n_groups: int, n_sounds: int) -> np.ndarray:
+  """
+  Number of distinct sound codes per group, in one pass over the rows.
+  Each group keeps a bitset of the sounds seen (one uint64 word per 64 sounds),
+  and the set bits are counted at the end.
+  """
+  n_words = (n_sounds + 63) // 64
+  bits = np.zeros((n_groups, n_words), dtype=np.uint64)
+  for i in range(group_ids.size):
+    s = sound_codes[i]
+    bits[group_ids[i], s >> 6] |= np.uint64(1) << np.uint64(s & 63)
+
+  counts = np.zeros(n_groups, dtype=np.int64)
+  for g in range(n_groups):
+    for w in range(n_words):
+      word = bits[g, w]
+      while word:
+        word &= word - np.uint64(1)
+        counts[g] += 1
+  return counts
+
+
 def process_country_phonic_richness(country: str, logit_cutoff: float) -> pd.DataFrame:
   """
   1) Load coverage-passing combos (using load_raw_file_list from the old script).
@@ -137,6 +158,8 @@ def process_country_phonic_richness(country: str, logit_cutoff: float) -> pd.Dat
   4) Left-merge with coverage combos so we keep only coverage-passing site–dates.
      Fill missing with 0.
   """
+  logging.info(f"Processing {country} for phonic richness...")
+
   # Step 1: coverage combos
   df_coverage = load_raw_file_list(country)
 
@@ -150,16 +173,18 @@ def process_country_phonic_richness(country: str, logit_cutoff: float) -> pd.Dat
       columns=["country", "site", "date", "treatment", "count"]
     )
   else:
-    # Count unique sounds
-    # groupby returns multiple rows => use .nunique() on 'sound'
-    df_presence_count = (
-      df_presence
-      .groupby(["country", "site", "date", "treatment"], as_index=False)["sound"]
-      .nunique()
-      .rename(columns={"sound": "count"})
+    # Count unique sounds per group from integer codes with a bitset kernel
+    # (much faster than groupby(...)["sound"].nunique())
+    group_keys = ["country", "site", "date", "treatment"]
+    group_ids, groups = pd.MultiIndex.from_frame(df_presence[group_keys]).factorize()
+    sound_codes = df_presence["sound"].cat.codes.to_numpy()
+    df_presence_count = groups.to_frame(index=False, name=group_keys)
+    df_presence_count["count"] = count_unique_sounds(
+      group_ids, sound_codes, len(groups), len(df_presence["sound"].cat.categories)
     )
 
   # Step 4: left merge with coverage combos => fill missing with 0
+  align_categories(df_coverage, df_presence_count, ["country", "site", "treatment"])
   df_out = pd.merge(
     df_coverage, 
     df_presence_count, 
@@ -173,31 +198,34 @@ def process_country_phonic_richness(country: str, logit_cutoff: float) -> pd.Dat
 
 def main() -> None:
   """
-  Build 'phonic richness' DataFrame for all countries, then save to OUTPUT_RICHNESS_PATH.
+  Build 'phonic richness' DataFrame for all countries, then save to OUTPUT_RICHNESS_PATH
+  (and to a Parquet file alongside it if --parquet is given).
   """
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+  parser.add_argument("--parquet", action="store_true", help="Also write the output as Parquet (ZSTD).")
+  args = parser.parse_args()
   logging.basicConfig(level=logging.INFO)
 
   # We'll re-use the same list of countries from combine_counts
   # If you prefer a smaller subset, define it here:
   countries = list(COUNTRY_CONFIG.keys())
 
-  combined_df = pd.DataFrame(columns=["country", "site", "date", "treatment", "count"])
-
-  for country in countries:
-    logging.info(f"Processing {country} for phonic richness...")
-    df_country = process_country_phonic_richness(country, LOGIT_CUTOFF)
-    combined_df = pd.concat([combined_df, df_country], ignore_index=True)
+  # Countries are independent, so process them in parallel.
+  # Collect the per-country frames and concatenate once at the end.
+  with ProcessPoolExecutor(max_workers=len(countries)) as executor:
+    worker = partial(process_country_phonic_richness, logit_cutoff=LOGIT_CUTOFF)
+    frames = list(executor.map(worker, countries))
+  combined_df = pd.concat(frames, ignore_index=True)
 
   # sort the order into something sensible and write csv
   combined_df.sort_values(["country", "treatment", "site", "date"], inplace=True)
 
-  out_path = os.path.join(
-    BASE_DIR,
-    "marrs_acoustics/data/results/functions",
-    "phonic_richness.csv"
-  )
-  combined_df.to_csv(out_path, index=False)
-  logging.info(f"Saved phonic richness to {out_path}")
+  combined_df.to_csv(OUTPUT_RICHNESS_PATH, index=False)
+  logging.info(f"Saved phonic richness to {OUTPUT_RICHNESS_PATH}")
+  if args.parquet:
+    parquet_path = OUTPUT_RICHNESS_PATH.replace(".csv", ".parquet")
+    combined_df.to_parquet(parquet_path, compression="zstd", index=False)
+    logging.info(f"Saved phonic richness to {parquet_path}")
 
 
 if __name__ == "__main__":
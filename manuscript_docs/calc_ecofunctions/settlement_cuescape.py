@@ -47,6 +47,8 @@ import os
 import logging
 import pandas as pd
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache, partial
 from datetime import datetime, timedelta, date
 
 from astral import LocationInfo
@@ -57,10 +59,12 @@ from count_ecofunctions import (
     COUNTRY_CONFIG,   
     FILE_COVERAGE,    
     LOGIT_CUTOFF,     
-    parse_site,
-    parse_date_time,
-    parse_treatment,
-    get_expected_daily_recordings
+    parse_filenames,
+    read_raw_filenames,
+    read_inference,
+    get_expected_daily_recordings,
+    align_categories,
+    list_sound_folders
 )
 
 OUTPUT_PATH = os.path.join(
@@ -68,6 +72,7 @@ OUTPUT_PATH = os.path.join(
     "marrs_acoustics/data/results/functions",
     "settlement_cuescape.csv"
 )
+NUM_SOUND_WORKERS = 8  # Inference CSVs read concurrently within each country
 
 # Coordinates + Local Timezone per country
 COUNTRY_INFO = {
@@ -114,48 +119,60 @@ def load_raw_file_list_simple(country: str) -> pd.DataFrame:
         logging.warning(f"raw_file_list.csv not found for {country}. Path: {raw_list_path}")
         return pd.DataFrame(columns=["filename", "site", "date", "treatment"])
 
-    df_raw = pd.read_csv(raw_list_path)
-
-    # We'll parse site + date + treatment from the filename
-    rows = []
-    for _, row_data in df_raw.iterrows():
-        filename = row_data["filename"]
-        filename_part = filename.split("/", 1)[-1] if "/" in filename else filename
-        site = parse_site(filename_part)
-        treatment = parse_treatment(filename_part)
-        dt_str = filename_part[7:15]  # 'YYYYMMDD'
-        rows.append((filename, site, dt_str, treatment))
-
-    df_temp = pd.DataFrame(rows, columns=["filename", "site", "date", "treatment"])
+    # Only the filename column is needed; parse the whole column at once
+    filenames = read_raw_filenames(raw_list_path)
+    filename_parts = filenames.str.split("/", n=1).str[-1]
+    df_temp = parse_filenames(filename_parts)
+    df_temp.insert(0, "filename", filenames)
 
     # Count how many files (rows) per site–date
     duty_cycle = COUNTRY_CONFIG[country]["duty_cycle"]
     expected_daily = get_expected_daily_recordings(duty_cycle)
     coverage_threshold = FILE_COVERAGE * expected_daily
 
-    df_counts = df_temp.groupby(["site", "date"]).size().reset_index(name="n_files")
-    insufficient = df_counts[df_counts["n_files"] < coverage_threshold]
-    if not insufficient.empty:
-        for _, row_ex in insufficient.iterrows():
+    # Per-row group size, so coverage is filtered without merging counts back
+    n_files = df_temp.groupby(["site", "date"], sort=False)["filename"].transform("size")
+    keep = n_files >= coverage_threshold
+
+    if not keep.all():
+        insufficient = df_temp[~keep].groupby(["site", "date"]).size().reset_index(name="n_files")
+        for row_ex in insufficient.itertuples(index=False):
             logging.info(
-                f"Excluding {country}, site={row_ex['site']}, date={row_ex['date']} "
-                f"(only {row_ex['n_files']} of {expected_daily} expected)"
+                f"Excluding {country}, site={row_ex.site}, date={row_ex.date} "
+                f"(only {row_ex.n_files} of {expected_daily} expected)"
             )
-    # Keep only combos above threshold
-    df_counts = df_counts[df_counts["n_files"] >= coverage_threshold]
-
-    # Merge back so only site–date combos above coverage remain
-    df_valid = pd.merge(
-        df_temp,
-        df_counts[["site", "date"]],
-        on=["site", "date"],
-        how="inner"
-    )
-    df_valid.drop_duplicates(inplace=True)
+
+    # Keep only rows whose site–date is above threshold
+    df_valid = df_temp[keep].drop_duplicates(ignore_index=True)
 
     return df_valid  # columns: ["filename", "site", "date", "treatment"]
 
 
+# One Astral location per country, built once from COUNTRY_INFO
+LOCATIONS = {
+    country: LocationInfo(
+        name=country,
+        region="None",
+        timezone=info["timezone"],
+        latitude=info["coords"][0],
+        longitude=info["coords"][1]
+    )
+    for country, info in COUNTRY_INFO.items()
+}
+
+
+@lru_cache(maxsize=None)
+def get_sun_times(the_date: date, country: str) -> (datetime, datetime):
+    """
+    Return (sunrise, sunset) on the_date in local time (tzinfo removed).
+    Cached, so each date's sun() is computed once and shared by the nights either side of it.
+    """
+    loc = LOCATIONS[country]
+    s_day = sun(loc.observer, date=the_date, tzinfo=loc.timezone)
+    return (s_day["sunrise"].replace(tzinfo=None), s_day["sunset"].replace(tzinfo=None))
+
+
+@lru_cache(maxsize=None)
 def get_night_window(the_date: date, country: str) -> (datetime, datetime):
     """
     Return (night_start, night_end) for 'night_of' the_date in local time:
@@ -163,28 +180,52 @@ def get_night_window(the_date: date, country: str) -> (datetime, datetime):
 
     We use the real local timezone from COUNTRY_INFO to ensure Astral lines up with local time.
     Then we remove tzinfo so we can compare with naive dt_local from the filename.
+    Cached per (date, country): rows only span a few hundred distinct dates.
     """
-    lat, lon = COUNTRY_INFO[country]["coords"]
-    tz_name = COUNTRY_INFO[country]["timezone"]
-
-    loc = LocationInfo(
-        name=country,
-        region="None",
-        timezone=tz_name,
-        latitude=lat,
-        longitude=lon
-    )
-
-    s_today = sun(loc.observer, date=the_date, tzinfo=loc.timezone)
-    sunset_time = s_today["sunset"].replace(tzinfo=None) - timedelta(minutes=30)
+    sunset_time = get_sun_times(the_date, country)[1] - timedelta(minutes=30)
 
     next_day = the_date + timedelta(days=1)
-    s_next = sun(loc.observer, date=next_day, tzinfo=loc.timezone)
-    sunrise_time = s_next["sunrise"].replace(tzinfo=None) + timedelta(minutes=30)
+    sunrise_time = get_sun_times(next_day, country)[0] + timedelta(minutes=30)
 
     return (sunset_time, sunrise_time)
 
 
+def parse_date_times(filename_parts: pd.Series) -> pd.Series:
+    """
+    Vectorized parse_date_time: 'ind_D2_20220830_130600.WAV' -> 2022-08-30 13:06:00.
+    The timestamp sits at a fixed offset, so a slice + fixed format avoids per-row strptime.
+    """
+    return pd.to_datetime(filename_parts.str.slice(7, 22), format="%Y%m%d_%H%M%S")
+
+
+def assign_night_of_date(dt_local: pd.Series, country: str) -> pd.Series:
+    """
+    Vectorized night assignment for a Series of naive local datetimes.
+
+    A row can only fall in the night of its own date or of the previous date (for the
+    hours after midnight), so windows are built for those dates only, with one
+    get_night_window call per distinct date. Nights never overlap, so one
+    IntervalIndex lookup (a binary search) finds the night each row falls in.
+    Returns night_of_date ('YYYYMMDD' of Day X) per row as a categorical built straight
+    from the lookup positions, or NaN if the row is daytime.
+    """
+    local_date = dt_local.dt.normalize()
+    night_dates = pd.DatetimeIndex(local_date.unique()).union(
+        pd.DatetimeIndex(local_date.unique()) - pd.Timedelta(days=1)
+    )
+    windows = [get_night_window(d.date(), country) for d in night_dates]
+    nights = pd.IntervalIndex.from_arrays(
+        pd.to_datetime([w[0] for w in windows]),
+        pd.to_datetime([w[1] for w in windows]),
+        closed="left"
+    )
+
+    # get_indexer gives -1 outside every window, which from_codes reads as missing
+    idx = nights.get_indexer(dt_local)
+    night_of_date = pd.Categorical.from_codes(idx, categories=night_dates.strftime("%Y%m%d"))
+    return pd.Series(night_of_date, index=dt_local.index)
+
+
 def gather_night_total_windows(country: str) -> pd.DataFrame:
     """
     For each coverage-passing row in raw_file_list_simple,
@@ -197,106 +238,98 @@ def gather_night_total_windows(country: str) -> pd.DataFrame:
     if df_raw.empty:
         return pd.DataFrame(columns=["country", "site", "night_of_date", "treatment", "total_5s_windows_night"])
   
-    rows = []
-    for _, row_data in df_raw.iterrows():
-        filename = row_data["filename"]
-        site = row_data["site"]
-        treatment = row_data["treatment"]
-        dt_local = parse_date_time(filename)  # naive datetime
-        local_date = dt_local.date()
-
-        night_start, night_end = get_night_window(local_date, country)
-        if night_start <= dt_local < night_end:
-            night_of_date = local_date
-        else:
-            # check previous day
-            prev_date = local_date - timedelta(days=1)
-            ns, ne = get_night_window(prev_date, country)
-            if ns <= dt_local < ne:
-                night_of_date = prev_date
-            else:
-                continue
-
-        rows.append((
-            country,
-            site,
-            night_of_date.strftime("%Y%m%d"),
-            treatment,
-            12  # 1 minute => 12 x 5sec
-        ))
-
-    df_minutes = pd.DataFrame(
-        rows, 
-        columns=["country","site","night_of_date","treatment","total_5s_windows_night"]
-    )
+    night_of_date = assign_night_of_date(parse_date_times(df_raw["filename"]), country)
+    in_night = night_of_date.notna()
+
+    df_minutes = pd.DataFrame({
+        "country": country,
+        "site": df_raw.loc[in_night, "site"],
+        "night_of_date": night_of_date[in_night],
+        "treatment": df_raw.loc[in_night, "treatment"],
+        "total_5s_windows_night": 12  # 1 minute => 12 x 5sec
+    }, columns=["country","site","night_of_date","treatment","total_5s_windows_night"])
+    # Low-cardinality keys => categoricals, so the groupby hashes integer codes
+    df_minutes = df_minutes.astype({col: "category" for col in ["country","site","night_of_date","treatment"]})
     df_sum = (
         df_minutes
-        .groupby(["country","site","night_of_date","treatment"], as_index=False)["total_5s_windows_night"]
+        .groupby(["country","site","night_of_date","treatment"], as_index=False, observed=True, sort=False)
+        ["total_5s_windows_night"]
         .sum()
     )
     return df_sum
 
 
+def count_night_detections(csv_path: str, country: str) -> pd.DataFrame:
+    """
+    Load one inference CSV, filter logit >= 1, and count the detected 5s windows
+    that fall in a night's window per (site, night_of_date, treatment).
+
+    Returns [country, site, night_of_date, treatment, 5s_window_detected].
+    """
+    # Only filename + logit are parsed, filtered by logit before reaching pandas
+    filename_parts = read_inference(csv_path, LOGIT_CUTOFF, columns=["filename_part"])["filename_part"]
+    # Each 1-minute file has up to 12 detected windows, so parse each filename once
+    # and carry its number of windows instead of a row per window
+    codes, unique_parts = pd.factorize(filename_parts)
+    unique_parts = pd.Series(unique_parts)
+    n_windows = np.bincount(codes, minlength=len(unique_parts))
+
+    night_of_date = assign_night_of_date(parse_date_times(unique_parts), country)
+    in_night = night_of_date.notna()
+    df_parsed = parse_filenames(unique_parts[in_night])
+
+    df_sound = pd.DataFrame({
+        "country": country,
+        "site": df_parsed["site"],
+        "night_of_date": night_of_date[in_night],
+        "treatment": df_parsed["treatment"],
+        "5s_window_detected": n_windows[in_night.to_numpy()]
+    }, columns=["country","site","night_of_date","treatment","5s_window_detected"])
+    df_sound = df_sound.astype({col: "category" for col in ["country","site","night_of_date","treatment"]})
+    return (
+        df_sound
+        .groupby(["country","site","night_of_date","treatment"], as_index=False, observed=True, sort=False)
+        ["5s_window_detected"]
+        .sum()
+    )
+
+
 def gather_night_inferences(country: str) -> pd.DataFrame:
     """
     For each subfolder in agile_outputs (except 'snaps'):
       - Load inference CSV, filter logit >= 1
-      - Parse local datetime => see if it belongs to that night's window
-      - Keep site, date, treatment
-      - If it belongs, 5s_window_detected=1
+      - Parse local datetimes => keep rows that fall in a night's window
+      - Parse site, treatment
+      - Count the detected 5s windows per (site, night_of_date, treatment)
+    The CSVs are read concurrently (see count_night_detections).
 
-    Return [country, site, night_of_date, treatment, 5s_window_detected].
+    Return [country, site, night_of_date, treatment, 5s_window_detected], with one row
+    per sound and group (5s_window_detected = # windows detected for that sound).
     """
     base_path = os.path.join(BASE_DIR, "marrs_acoustics/data", f"output_dir_{country}", "agile_outputs")
     if not os.path.isdir(base_path):
         logging.warning(f"No agile_outputs folder for {country}")
         return pd.DataFrame(columns=["country","site","night_of_date","treatment","5s_window_detected"])
 
-    presence_rows = []
-    for sound_folder in os.listdir(base_path):
+    csv_paths = []
+    for sound_folder in list_sound_folders(base_path):
         if sound_folder.lower() == "snaps":
             logging.info(f"Skipping 'snaps' folder for {country}")
             continue
 
-        folder_path = os.path.join(base_path, sound_folder)
-        if not os.path.isdir(folder_path):
-            continue
+        logging.info(f"Parsing {sound_folder} for {country}...")
+        csv_path = os.path.join(base_path, sound_folder, f"{sound_folder}_inference.csv")
+        csv_paths.append(csv_path)
 
-        csv_path = os.path.join(folder_path, f"{sound_folder}_inference.csv")
-        if not os.path.isfile(csv_path):
-            logging.info(f"No CSV for {sound_folder} in {country}")
-            continue
+    # Inference files are read on a thread pool (pyarrow parses CSVs without the GIL)
+    with ThreadPoolExecutor(max_workers=NUM_SOUND_WORKERS) as executor:
+        worker = partial(count_night_detections, country=country)
+        presence_rows = list(executor.map(worker, csv_paths))
 
-        logging.info(f"Parsing {sound_folder} for {country}...")
-        df_infer = pd.read_csv(csv_path)
-        col_logit = " logit" if " logit" in df_infer.columns else "logit"
-        df_infer = df_infer[df_infer[col_logit] >= LOGIT_CUTOFF]
-
-        for _, row_inf in df_infer.iterrows():
-            filename_part = row_inf["filename"].split("/", 1)[-1]
-            dt_local = parse_date_time(filename_part)
-            site = parse_site(filename_part)
-            treatment = parse_treatment(filename_part)
-
-            local_date = dt_local.date()
-            night_start, night_end = get_night_window(local_date, country)
-            if night_start <= dt_local < night_end:
-                night_of_date = local_date
-            else:
-                # check previous day
-                prev_date = local_date - timedelta(days=1)
-                ns, ne = get_night_window(prev_date, country)
-                if ns <= dt_local < ne:
-                    night_of_date = prev_date
-                else:
-                    continue
-
-            presence_rows.append((country, site, night_of_date.strftime("%Y%m%d"), treatment, 1))
-
-    df_detections = pd.DataFrame(
-        presence_rows, 
-        columns=["country","site","night_of_date","treatment","5s_window_detected"]
-    )
+    if not presence_rows:
+        return pd.DataFrame(columns=["country","site","night_of_date","treatment","5s_window_detected"])
+
+    df_detections = pd.concat(presence_rows, ignore_index=True)
     return df_detections
 
 
@@ -310,6 +343,7 @@ def process_country_nighttime_proportion(country: str) -> pd.DataFrame:
     6) log_max_poss_count = log(max_poss_count)
     7) rename 'night_of_date' => 'date'
     """
+    logging.info(f"Processing nighttime proportion for {country}...")
     df_total = gather_night_total_windows(country)
     if df_total.empty:
         return pd.DataFrame(columns=[
@@ -318,10 +352,14 @@ def process_country_nighttime_proportion(country: str) -> pd.DataFrame:
         ])
 
     df_detect = gather_night_inferences(country)
+    # Per-sound frames have their own categories; share one set with df_total so
+    # the groupby and merge below work on the integer codes
+    align_categories(df_total, df_detect, ["country","site","night_of_date","treatment"])
     # Sum all detections (5s_window_detected) per group
     df_detect_sum = (
         df_detect
-        .groupby(["country","site","night_of_date","treatment"], as_index=False)["5s_window_detected"]
+        .groupby(["country","site","night_of_date","treatment"], as_index=False, observed=True, sort=False)
+        ["5s_window_detected"]
         .sum()
         .rename(columns={"5s_window_detected":"count"})
     )
@@ -367,12 +405,15 @@ def main() -> None:
         "country","site","date","treatment",
         "proportion_night_detections","count","max_poss_count","log_max_poss_count"
     ]
-    combined_df = pd.DataFrame(columns=columns)
-
-    for country in COUNTRY_CONFIG.keys():
-        logging.info(f"Processing nighttime proportion for {country}...")
-        df_country = process_country_nighttime_proportion(country)
-        combined_df = pd.concat([combined_df, df_country], ignore_index=True)
+    # Countries are independent, so process them in parallel.
+    # Collect the per-country frames and concatenate once at the end; empty frames
+    # (no raw file list) carry object columns and would force them onto the result.
+    countries = list(COUNTRY_CONFIG.keys())
+    with ProcessPoolExecutor(max_workers=min(len(countries), os.cpu_count())) as executor:
+        frames = [df for df in executor.map(process_country_nighttime_proportion, countries) if not df.empty]
+    if not frames:
+        frames.append(pd.DataFrame(columns=columns))
+    combined_df = pd.concat(frames, ignore_index=True)
 
     combined_df.sort_values(["country","site","date","treatment"], inplace=True)
     combined_df.to_csv(OUTPUT_PATH, index=False)
@@ -14,9 +14,9 @@ import os
 import logging
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-from scipy.stats import gaussian_kde
-from typing import List, Tuple, Set, Dict, Any
+import matplotlib
+matplotlib.use("Agg")  # workers render plots without a display
+from typing import Dict, Any
 
 # Import functions and variables from count_ecofunctions
 from count_ecofunctions import (
@@ -24,17 +24,22 @@ from count_ecofunctions import (
     COUNTRY_CONFIG,
     FILE_COVERAGE,
     LOGIT_CUTOFF,
-    parse_date,
-    parse_site,
-    parse_treatment,
+    parse_all,
+    read_raw_filenames,
     load_raw_file_list,
     get_expected_daily_recordings,
-    parse_date_time,
+    TIME_GRID,
+    kde_1d,
+    get_plot_axes,
+    load_sound_detections,
+    run_sound_workers,
+    read_cached_frame,
+    write_cached_frame,
 )
 
 # Global constants
 COVERAGE_THRESHOLD = 0.95    # 95% coverage required per site–date pair
-SMOOTHING = 0.5              # Smoothing factor for kernel density estimation
+NUM_WORKERS = os.cpu_count() # Sounds are processed in parallel
 KERNEL_PLOTS_DIR = os.path.join(
     BASE_DIR, "marrs_acoustics/data/results/functions/kernels/plots"
 )
@@ -51,144 +56,103 @@ TREATMENTS = ["healthy", "degraded", "restored", "newly_restored"]
 GROUP1 = ["healthy", "degraded", "restored"]
 GROUP2 = ["healthy", "degraded", "newly_restored"]
 
-def get_valid_site_dates(country: str, threshold: float = COVERAGE_THRESHOLD) -> Set[Tuple[str, str]]:
+def get_valid_site_dates(country: str, threshold: float = COVERAGE_THRESHOLD) -> pd.MultiIndex:
     """
-    Return a set of (site, date) pairs for the given country with at least the required coverage.
+    Return a MultiIndex of (site, date) pairs for the given country with at least the required coverage.
     """
     raw_list_path = os.path.join(
         BASE_DIR, "marrs_acoustics/data", f"output_dir_{country}", "raw_file_list.csv"
     )
     if not os.path.isfile(raw_list_path):
         logging.warning(f"raw_file_list.csv not found for {country}. Path: {raw_list_path}")
-        return set()
-    df_raw = pd.read_csv(raw_list_path)
-    df_raw["filename_part"] = df_raw["filename"].apply(lambda x: x.split("/", 1)[-1])
-    df_raw["date"] = df_raw["filename_part"].apply(parse_date)
-    df_raw["site"] = df_raw["filename_part"].apply(parse_site)
-    df_counts = df_raw.groupby(["site", "date"]).size().reset_index(name="n_files")
+        return pd.MultiIndex.from_tuples([], names=["site", "date"])
     duty_cycle = COUNTRY_CONFIG[country]["duty_cycle"]
+    # Both temporal scripts need the same pairs, so reuse them while raw_file_list.csv
+    # and the parameters they depend on are unchanged
+    cache_path = os.path.join(os.path.dirname(raw_list_path), f"valid_site_dates_{int(threshold*100)}.feather")
+    cache_key = f"threshold={threshold!r},duty_cycle={duty_cycle!r}"
+    cached = read_cached_frame(cache_path, raw_list_path, cache_key)
+    if cached is not None:
+        return pd.MultiIndex.from_frame(cached)
+
+    filenames = read_raw_filenames(raw_list_path)
+    # Parse each distinct filename once, then expand back to one row per file
+    codes, unique_parts = pd.factorize(filenames.str.rsplit("/", n=1).str[-1])
+    sites, dates, _ = parse_all(unique_parts)
+    df_raw = pd.DataFrame({"site": pd.Categorical(sites[codes]), "date": dates[codes]})
+    df_counts = df_raw.groupby(["site", "date"], observed=True).size().reset_index(name="n_files")
     expected_daily = get_expected_daily_recordings(duty_cycle)
     valid = df_counts[df_counts["n_files"] >= expected_daily * threshold]
-    valid_pairs = set(valid.apply(lambda row: (row["site"], row["date"]), axis=1))
+    write_cached_frame(valid[["site", "date"]], cache_path, raw_list_path, cache_key)
+    valid_pairs = pd.MultiIndex.from_frame(valid[["site", "date"]])
     return valid_pairs
 
-def process_sound_country(country: str, valid_pairs: Set[Tuple[str, str]]) -> None:
+def process_sound(country: str, sound_folder: str, lookup_dir: str) -> None:
     """
-    For each sound in the country's agile_outputs folder, produce an aggregated kernel plot 
-    if the sound meets detection criteria.
-    
-    Aggregated plots are produced if the sound has at least 100 detections in each treatment 
-    for either:
-      - Group1: healthy, degraded, restored, or
-      - Group2: healthy, degraded, newly_restored.
-    If both criteria are met, the plot will include the union of treatments (all four).
-    The aggregated plot is saved with filename "aggreg_<sound>.png".
+    Produce the aggregated kernel plot for one sound folder in a country, if the
+    sound has at least 100 detections in each treatment of GROUP1 or GROUP2
+    (all four treatments are plotted if both qualify). Saved as "aggreg_<sound>.png".
+    Runs in a run_sound_workers worker; detections on valid site-date pairs come
+    from load_sound_detections.
     """
-    agile_dir = os.path.join(
-        BASE_DIR, "marrs_acoustics/data", f"output_dir_{country}", "agile_outputs"
-    )
-    if not os.path.isdir(agile_dir):
-        logging.warning(f"Agile outputs directory not found for {country}: {agile_dir}")
+    df_records = load_sound_detections(country, sound_folder, lookup_dir)
+    if df_records is None:
         return
-
     country_plot_dir = os.path.join(KERNEL_PLOTS_DIR, country)
     os.makedirs(country_plot_dir, exist_ok=True)
 
-    for sound_folder in os.listdir(agile_dir):
-        folder_path = os.path.join(agile_dir, sound_folder)
-        if not os.path.isdir(folder_path):
-            continue
-        csv_path = os.path.join(folder_path, f"{sound_folder}_inference.csv")
-        if not os.path.isfile(csv_path):
-            logging.info(f"No CSV found for sound {sound_folder} in {country}. Skipping.")
-            continue
+    # Plain arrays for the per-treatment slicing: times plus treatment codes (index into TREATMENTS)
+    all_times = df_records["time"].to_numpy()
+    treatment_codes = pd.Categorical(df_records["treatment"], categories=TREATMENTS).codes
+
+    # Count detections per treatment
+    n_per_code = np.bincount(treatment_codes[treatment_codes >= 0], minlength=len(TREATMENTS))
+    counts = dict(zip(TREATMENTS, n_per_code))
+    group1_ok = all(counts.get(t, 0) >= 100 for t in GROUP1)
+    group2_ok = all(counts.get(t, 0) >= 100 for t in GROUP2)
+    if not group1_ok and not group2_ok:
+        logging.info(f"Sound {sound_folder} does not meet aggregated criteria for either grouping. Skipping plot.")
+        return
 
-        logging.info(f"Processing sound: {sound_folder} in {country}")
+    # If qualifies for both, take union (i.e., all treatments)
+    if group1_ok and group2_ok:
+        treatments_to_plot = TREATMENTS
+    elif group1_ok:
+        treatments_to_plot = GROUP1
+    else:
+        treatments_to_plot = GROUP2
+
+    # Produce a single plot using the chosen treatments
+    fig, ax = get_plot_axes()
+    for treatment in treatments_to_plot:
+        times = all_times[treatment_codes == TREATMENTS.index(treatment)]
+        if times.size == 0:
+            ax.plot([], [], color=TREATMENT_COLOURS[treatment], label=treatment)
+            continue
         try:
-            df_infer = pd.read_csv(csv_path)
+            density = kde_1d(times)
+            if density is None:
+                logging.info(f"Too few detections of sound {sound_folder} in treatment {treatment} for a KDE in {country}.")
+                ax.plot([], [], color=TREATMENT_COLOURS[treatment], label=treatment)
+            else:
+                ax.plot(TIME_GRID, density, color=TREATMENT_COLOURS[treatment], label=treatment)
         except Exception as e:
-            logging.error(f"Error reading CSV for sound {sound_folder} in {country}: {e}")
-            continue
-
-        logit_col = " logit" if " logit" in df_infer.columns else "logit"
-        df_infer = df_infer[df_infer[logit_col] >= 1.0]
-        if df_infer.empty:
-            logging.info(f"No detections for sound {sound_folder} in {country} after logit filtering.")
-            continue
-
-        records = []
-        for _, row in df_infer.iterrows():
-            filename_full = row["filename"]
-            filename_part = filename_full.split("/", 1)[-1]
-            site = parse_site(filename_part)
-            date_str = parse_date(filename_part)
-            if (site, date_str) not in valid_pairs:
-                continue
-            try:
-                dt = parse_date_time(filename_part)
-            except Exception as e:
-                logging.error(f"Error parsing datetime from {filename_part}: {e}")
-                continue
-            time_decimal = dt.hour + dt.minute/60 + dt.second/3600
-            treatment = parse_treatment(filename_part)
-            records.append({"treatment": treatment, "time": time_decimal})
-        
-        if not records:
-            logging.info(f"No valid detections for sound {sound_folder} in {country} on valid site-date pairs.")
-            continue
-
-        df_records = pd.DataFrame(records)
-        # Count detections per treatment
-        counts = df_records.groupby("treatment").size().to_dict()
-        group1_ok = all(counts.get(t, 0) >= 100 for t in GROUP1)
-        group2_ok = all(counts.get(t, 0) >= 100 for t in GROUP2)
-        if not group1_ok and not group2_ok:
-            logging.info(f"Sound {sound_folder} does not meet aggregated criteria for either grouping. Skipping plot.")
-            continue
-
-        # If qualifies for both, take union (i.e., all treatments)
-        if group1_ok and group2_ok:
-            treatments_to_plot = TREATMENTS
-        elif group1_ok:
-            treatments_to_plot = GROUP1
-        else:
-            treatments_to_plot = GROUP2
-
-        # Produce a single plot using the chosen treatments
-        time_grid = np.linspace(0, 24, 240)
-        plt.figure(figsize=(8, 6))
-        for treatment in treatments_to_plot:
-            times = df_records[df_records["treatment"] == treatment]["time"].values
-            if times.size == 0:
-                plt.plot([], [], color=TREATMENT_COLOURS[treatment], label=treatment)
-                continue
-            try:
-                kde = gaussian_kde(times, bw_method=SMOOTHING)
-                density = kde(time_grid)
-                plt.plot(time_grid, density, color=TREATMENT_COLOURS[treatment], label=treatment)
-            except Exception as e:
-                logging.error(f"Error computing KDE for sound {sound_folder} treatment {treatment} in {country}: {e}")
-                plt.plot([], [], color=TREATMENT_COLOURS[treatment], label=treatment)
-        plt.xlabel("Hour of Day")
-        plt.ylabel("Density")
-        plt.title(f"Temporal Kernel for {sound_folder} in {country}")
-        plt.xlim(0, 24)
-        plt.legend()
-        plot_path = os.path.join(country_plot_dir, f"aggreg_{sound_folder}.png")
-        plt.savefig(plot_path)
-        plt.close()
-        logging.info(f"Saved aggregated plot for sound {sound_folder} in {country} to {plot_path}")
+            logging.error(f"Error computing KDE for sound {sound_folder} treatment {treatment} in {country}: {e}")
+            ax.plot([], [], color=TREATMENT_COLOURS[treatment], label=treatment)
+    ax.set_xlabel("Hour of Day")
+    ax.set_ylabel("Density")
+    ax.set_title(f"Temporal Kernel for {sound_folder} in {country}")
+    ax.set_xlim(0, 24)
+    ax.legend()
+    plot_path = os.path.join(country_plot_dir, f"aggreg_{sound_folder}.png")
+    fig.savefig(plot_path)
+    logging.info(f"Saved aggregated plot for sound {sound_folder} in {country} to {plot_path}")
 
 def main() -> None:
     """Process each country and compute aggregated temporal kernels for each sound."""
     logging.basicConfig(level=logging.INFO)
-    for country in COUNTRY_CONFIG.keys():
-        logging.info(f"Processing country: {country}")
-        valid_pairs = get_valid_site_dates(country, COVERAGE_THRESHOLD)
-        if not valid_pairs:
-            logging.info(f"No site-date pairs with sufficient coverage for {country}. Skipping.")
-            continue
-        process_sound_country(country, valid_pairs)
+    # Sounds are independent, so every country's sounds share one process pool
+    run_sound_workers(process_sound, get_valid_site_dates, max_workers=NUM_WORKERS)
 
 if __name__ == "__main__":
     main()
@@ -7,12 +7,12 @@ if not base_dir:
 
 CSV_PATH = os.path.join(base_dir, "marrs_acoustics/data/results/extra_outputs/agile_auc_roc_scores.csv")
 
-# read in CSV_PATH
-DATA = pd.read_csv(CSV_PATH, index_col=0)
+# read in only the roc_auc column of CSV_PATH
+ROC_AUC = pd.read_csv(CSV_PATH, usecols=['roc_auc'], engine='pyarrow')['roc_auc']
 
 # print mean and stdev of roc_auc column
-mean_auc = DATA['roc_auc'].mean()
-stdev_auc = DATA['roc_auc'].std()
+mean_auc = ROC_AUC.mean()
+stdev_auc = ROC_AUC.std()
 print(f"Mean AUC: {mean_auc}")          
 print(f"Standard Deviation AUC: {stdev_auc}")
 
@@ -3,42 +3,65 @@ dir = '/media/bwilliams/New Volume/marrs_acoustics/australia_acoustics/raw_audio
 # for every audio file in dir and any sub dirs, in filename change 'd' to 'D', 'h' to 'H', 'r' to 'R' where present
 # e.g. 'ind_d5_20211023_230000.wav' -> 'ind_D5_20211023_230000.wav'
 import os
-import shutil
-from typing import List
+from collections import defaultdict
+from typing import Iterator, List
+
+# 'd' -> 'D', 'h' -> 'H', 'r' -> 'R' in a single pass over the filename
+TRANS = str.maketrans('dhr', 'DHR')
+
+def walk_wavs(path: str, exclude_dir: str) -> Iterator[str]:
+    """Yield the .wav files under path with os.scandir, skipping files directly in exclude_dir.
+
+    Like os.walk, symlinks to directories are not followed and unreadable directories are skipped.
+    """
+    try:
+        entries = list(os.scandir(path))
+    except OSError:
+        return
+    for entry in entries:
+        if entry.is_dir():
+            if not entry.is_symlink():
+                yield from walk_wavs(entry.path, exclude_dir)
+        elif path != exclude_dir and entry.name.lower().endswith('.wav'):
+            yield entry.path
 
 def get_audio_files_in_subdirectories(base_path: str, exclude_dir: str) -> List[str]:
-    audio_files = []
-    for root, _, files in os.walk(base_path):
-        print(f"Root: {root}")
-        print(f'Length of files: {len(files)}')
-        if root == exclude_dir:
+    return list(walk_wavs(base_path, exclude_dir))
+
+
+def uppercase_site_codes(files: List[str]):
+    """Rename each file in place, uppercasing 'd', 'h' and 'r' in its filename."""
+    # Group the renames by parent directory, skipping names that are already uppercase
+    renames_by_dir = defaultdict(list)
+    for file in files:
+        dir_path, filename = os.path.split(file)
+        new_filename = filename.translate(TRANS)
+        if new_filename != filename:
+            renames_by_dir[dir_path].append((filename, new_filename))
+
+    # Rename relative to one open directory fd per directory, so each path is resolved once
+    for dir_path, pairs in renames_by_dir.items():
+        try:
+            dfd = os.open(dir_path, os.O_RDONLY | os.O_DIRECTORY)
+        except OSError as e:
+            print(f"Error opening {dir_path}: {e}")
             continue
-        for file in files:
-            if file.lower().endswith('.wav'):
-                audio_files.append(os.path.join(root, file))
-    return audio_files
-        
-
-def move_files_to_directory(files: List[str], destination_dir: str):
-    if not os.path.exists(destination_dir):
-        os.makedirs(destination_dir)
-    for file in files:  
         try:
-            dir_path = os.path.dirname(file)
-            filename = os.path.basename(file)
-            new_filename = filename.replace('d', 'D').replace('h', 'H').replace('r', 'R')
-            new_name = os.path.join(dir_path, new_filename)
-            os.rename(file, new_name)
-        except Exception as e:
-            print(f"Error renaming {file}: {e}")
+            for filename, new_filename in pairs:
+                try:
+                    os.rename(filename, new_filename, src_dir_fd=dfd, dst_dir_fd=dfd)
+                except Exception as e:
+                    print(f"Error renaming {os.path.join(dir_path, filename)}: {e}")
+        finally:
+            os.close(dfd)
 
 def main():
     # Get all audio files in subdirectories, excluding the 'raw_audio' directory
     audio_files = get_audio_files_in_subdirectories(dir, dir)
     print(f"Found {len(audio_files)} audio files to move.")
 
-    # Move files to the 'raw_audio' directory
-    move_files_to_directory(audio_files, dir)
+    # Rename files in place (each stays in its own directory)
+    uppercase_site_codes(audio_files)
 
 if __name__ == "__main__":
     main()
@@ -6,9 +6,12 @@ for each sound with entries from files not in raw_file_list.csv excluded.
 """
 
 import os
-import csv
 import logging
-from typing import Set
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 
 # Global constants
 base_dir = os.getenv('BASE_DIR')
@@ -18,18 +21,14 @@ if not base_dir:
 OUTPUT_DIR = os.path.join(base_dir, "marrs_acoustics/data/output_dir_maldives/agile_outputs")
 RAW_FILE_LIST_PATH = os.path.join(base_dir, "marrs_acoustics/data/output_dir_maldives/raw_file_list.csv")
 PREFIX = "raw_audio/"
+NUM_WORKERS = 8  # Sound folders filtered concurrently
 
-def load_raw_file_set(file_path: str) -> Set[str]:
-  """Load raw file list and return a set of filenames."""
-  raw_files: Set[str] = set()
-  with open(file_path, "r", newline="") as f:
-    reader = csv.DictReader(f)
-    for row in reader:
-      filename = row["filename"].strip()
-      raw_files.add(filename)
-  return raw_files
+def load_raw_file_set(file_path: str) -> pa.Array:
+  """Load raw file list and return the distinct filenames as an Arrow array (a pc.is_in value set)."""
+  filenames = pd.read_csv(file_path, usecols=["filename"], dtype=str, engine="pyarrow")["filename"]
+  return pc.unique(pa.array(filenames.str.strip(), type=pa.string()))
 
-def process_folder(folder: str, raw_file_set: Set[str]) -> None:
+def process_folder(folder: str, raw_file_set: pa.Array) -> None:
   """Process a folder: filter the _inference_old.csv using the raw file list."""
   folder_path = os.path.join(OUTPUT_DIR, folder)
   old_csv_path = os.path.join(folder_path, f"{folder}_inference_old.csv")
@@ -37,26 +36,19 @@ def process_folder(folder: str, raw_file_set: Set[str]) -> None:
     logging.info(f"Skipping {folder}: {old_csv_path} not found.")
     return
 
-  with open(old_csv_path, "r", newline="") as f:
-    reader = csv.DictReader(f)
-    rows = list(reader)
+  # Every column is kept as text so the rows are written back exactly as read
+  # (the pyarrow engine would still parse numbers, turning e.g. '1.00' into '1.0')
+  df = pd.read_csv(old_csv_path, dtype=str, keep_default_na=False)
+  # Remove the 'raw_audio/' prefix if present, then test all rows at once
+  filenames = df["filename"].str.strip().str.removeprefix(PREFIX)
+  in_raw_list = pc.is_in(pa.array(filenames, type=pa.string()), value_set=raw_file_set)
+  df_new = df[in_raw_list.to_numpy(zero_copy_only=False)]
 
-  n_old = len(rows)
-  filtered_rows = []
-  for row in rows:
-    original_filename = row.get("filename", "").strip()
-    # Remove the 'raw_audio/' prefix if present
-    filename = original_filename[len(PREFIX):] if original_filename.startswith(PREFIX) else original_filename
-    if filename in raw_file_set:
-      filtered_rows.append(row)
-
-  n_new = len(filtered_rows)
   new_csv_path = os.path.join(folder_path, f"{folder}_inference.csv")
-  with open(new_csv_path, "w", newline="") as f:
-    writer = csv.DictWriter(f, fieldnames=reader.fieldnames)
-    writer.writeheader()
-    writer.writerows(filtered_rows)
+  df_new.to_csv(new_csv_path, index=False, lineterminator="\r\n")
 
+  n_old = len(df)
+  n_new = len(df_new)
   excluded_count = n_old - n_new
   logging.info(f"{folder}: old entries: {n_old}, excluded: {excluded_count}")
 
@@ -64,10 +56,10 @@ def main() -> None:
   """Main function to process all subfolders in the agile outputs directory."""
   logging.basicConfig(level=logging.INFO, format="%(message)s")
   raw_file_set = load_raw_file_set(RAW_FILE_LIST_PATH)
-  for entry in os.listdir(OUTPUT_DIR):
-    folder_path = os.path.join(OUTPUT_DIR, entry)
-    if os.path.isdir(folder_path):
-      process_folder(entry, raw_file_set)
+  folders = [entry for entry in os.listdir(OUTPUT_DIR) if os.path.isdir(os.path.join(OUTPUT_DIR, entry))]
+  # Each folder is an independent read-filter-write; threads overlap their disk I/O
+  with ThreadPoolExecutor(max_workers=NUM_WORKERS) as executor:
+    list(executor.map(partial(process_folder, raw_file_set=raw_file_set), folders))
 
 if __name__ == "__main__":
   main()
@@ -1,10 +1,45 @@
 import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import List, Tuple
 
 ROOT_DIR = "/media/bwilliams/New Volume/mars_global_acoustic_study/detections"
+NUM_WORKERS = 16  # Directory listings are I/O-bound, so threads overlap them
+
+def scan_dir(path: str) -> Tuple[int, List[str]]:
+  """Returns (number of files, subdirectories to descend into) for one directory.
+
+  Matches os.walk: symlinks to directories are neither counted nor followed, and
+  unreadable directories are skipped.
+  """
+  n_files = 0
+  subdirs = []
+  try:
+    with os.scandir(path) as entries:
+      for entry in entries:
+        if not entry.is_dir():
+          n_files += 1
+        elif not entry.is_symlink():
+          subdirs.append(entry.path)
+  except OSError:
+    pass
+  return n_files, subdirs
 
 def count_files(path: str) -> int:
-  """Recursively counts all files in the directory and its subdirectories."""
-  return sum(len(files) for _, _, files in os.walk(path))
+  """Recursively counts all files in the directory and its subdirectories.
+
+  Each directory is listed as a separate task on a thread pool, so listings of
+  sibling directories overlap.
+  """
+  total = 0
+  with ThreadPoolExecutor(max_workers=NUM_WORKERS) as executor:
+    pending = {executor.submit(scan_dir, path)}
+    while pending:
+      done, pending = wait(pending, return_when=FIRST_COMPLETED)
+      for future in done:
+        n_files, subdirs = future.result()
+        total += n_files
+        pending.update(executor.submit(scan_dir, subdir) for subdir in subdirs)
+  return total
 
 if __name__ == "__main__":
   total = count_files(ROOT_DIR)
@@ -1,44 +1,138 @@
+import argparse
 import logging
-import librosa
+import queue
+import numpy as np
 import soundfile as sf
-from concurrent.futures import ProcessPoolExecutor, as_completed
+import soxr
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
 from pathlib import Path
-from typing import List
+from typing import Callable, List, Tuple
 from tqdm import tqdm  # pip install tqdm
 
 # Global variables
 SOURCE_DIR: Path = Path("/media/bwilliams/New Volume/mars_global_acoustic_study/maldives_acoustics/raw_audio")
 TARGET_SAMPLE_RATE: int = 16000
 NUM_WORKERS: int = 8  # Adjust as needed
+READ_WORKERS: int = 2  # Threads decoding files (disk-bound)
+WRITE_WORKERS: int = 2  # Threads writing files (disk-bound)
+QUEUE_DEPTH: int = 4  # Max decoded/resampled files held in memory between stages
 
 logging.basicConfig(level=logging.ERROR, format="%(asctime)s - %(levelname)s - %(message)s")
 
+def read_file(file_path: Path) -> Tuple[np.ndarray, int]:
+  """Decodes a WAV file with libsndfile and mixes it down to mono. Returns (audio, sample_rate)."""
+  audio, sample_rate = sf.read(file_path, dtype="float32")
+  if audio.ndim > 1:
+    audio = audio.mean(axis=1)
+  return audio, sample_rate
+
+def resample_audio(audio: np.ndarray, sample_rate: int) -> np.ndarray:
+  """Resamples mono audio to TARGET_SAMPLE_RATE with soxr."""
+  if sample_rate == TARGET_SAMPLE_RATE:
+    return audio
+  return soxr.resample(audio, sample_rate, TARGET_SAMPLE_RATE, quality="HQ")
+
+def write_file(file_path: Path, audio: np.ndarray) -> None:
+  """Writes 16kHz audio to a temporary file, then atomically replaces file_path with it."""
+  tmp_path: Path = file_path.with_suffix(file_path.suffix + ".tmp")
+  # Write with explicit format to avoid extension issues
+  sf.write(tmp_path, audio, TARGET_SAMPLE_RATE, format="WAV", subtype="PCM_16")
+  tmp_path.replace(file_path)
+
 def process_file(file_path: Path) -> None:
-  """Downsamples a WAV file to 16kHz using librosa and soundfile, replacing the original file.
+  """Downsamples a WAV file to 16kHz mono using soundfile and soxr, replacing the original file.
 
   Args:
     file_path: Path to the input WAV file.
   """
   try:
-    # Load file and resample to TARGET_SAMPLE_RATE
-    audio, _ = librosa.load(file_path, sr=TARGET_SAMPLE_RATE)
-    tmp_path: Path = file_path.with_suffix(file_path.suffix + ".tmp")
-    # Write with explicit format to avoid extension issues
-    sf.write(tmp_path, audio, TARGET_SAMPLE_RATE, format="WAV")
-    tmp_path.replace(file_path)
+    write_file(file_path, resample_audio(*read_file(file_path)))
   except Exception as err:
     logging.error(f"Error processing {file_path.name}: {err}")
 
+def run_pipeline(wav_files: List[Path], on_done: Callable[[], None]) -> None:
+  """Downsamples wav_files with the read, resample and write stages overlapped across files.
+
+  READ_WORKERS threads decode files into a bounded queue, NUM_WORKERS threads resample
+  them into a second bounded queue, and WRITE_WORKERS threads write them out. The queues
+  cap how many decoded files are held in memory. on_done is called once per file,
+  whether it succeeded or not.
+  """
+  paths: queue.Queue = queue.Queue()
+  for wav in wav_files:
+    paths.put(wav)
+  decoded: queue.Queue = queue.Queue(maxsize=QUEUE_DEPTH)
+  resampled: queue.Queue = queue.Queue(maxsize=QUEUE_DEPTH)
+
+  def read_stage() -> None:
+    while True:
+      try:
+        file_path = paths.get_nowait()
+      except queue.Empty:
+        return
+      try:
+        decoded.put((file_path, *read_file(file_path)))
+      except Exception as err:
+        logging.error(f"Error reading {file_path.name}: {err}")
+        on_done()
+
+  def resample_stage() -> None:
+    while (item := decoded.get()) is not None:
+      file_path, audio, sample_rate = item
+      try:
+        resampled.put((file_path, resample_audio(audio, sample_rate)))
+      except Exception as err:
+        logging.error(f"Error resampling {file_path.name}: {err}")
+        on_done()
+
+  def write_stage() -> None:
+    while (item := resampled.get()) is not None:
+      file_path, audio = item
+      try:
+        write_file(file_path, audio)
+      except Exception as err:
+        logging.error(f"Error writing {file_path.name}: {err}")
+      on_done()
+
+  with ThreadPoolExecutor(max_workers=READ_WORKERS) as readers, \
+       ThreadPoolExecutor(max_workers=NUM_WORKERS) as resamplers, \
+       ThreadPoolExecutor(max_workers=WRITE_WORKERS) as writers:
+    read_futures = [readers.submit(read_stage) for _ in range(READ_WORKERS)]
+    resample_futures = [resamplers.submit(resample_stage) for _ in range(NUM_WORKERS)]
+    write_futures = [writers.submit(write_stage) for _ in range(WRITE_WORKERS)]
+    # Once a stage has finished, send one stop sentinel per worker of the next stage
+    wait(read_futures)
+    for _ in resample_futures:
+      decoded.put(None)
+    wait(resample_futures)
+    for _ in write_futures:
+      resampled.put(None)
+    wait(write_futures)
+
 def main() -> None:
-  """Finds all WAV files in the source folder and downsamples them concurrently with progress tracking."""
+  """Finds all WAV files in the source folder and downsamples them concurrently with progress tracking.
+
+  By default files go through a threaded read -> resample -> write pipeline (see
+  run_pipeline): libsndfile and soxr release the GIL, and overlapping the stages hides
+  disk latency behind resampling. Pass --processes to process whole files on a
+  process pool instead.
+  """
+  parser = argparse.ArgumentParser(description="Downsample WAV files in SOURCE_DIR to 16kHz in place.")
+  parser.add_argument("--processes", action="store_true", help="Use a process pool instead of threads.")
+  args = parser.parse_args()
+
   wav_files: List[Path] = list(SOURCE_DIR.glob("*.WAV"))
   if not wav_files:
     logging.error("No WAV files found in the folder.")
     return
 
-  with ProcessPoolExecutor(max_workers=NUM_WORKERS) as executor:
-    futures = {executor.submit(process_file, wav): wav for wav in wav_files}
-    with tqdm(total=len(wav_files), desc="Processing files", unit="file") as pbar:
+  with tqdm(total=len(wav_files), desc="Processing files", unit="file") as pbar:
+    if not args.processes:
+      run_pipeline(wav_files, lambda: pbar.update(1))
+      return
+
+    with ProcessPoolExecutor(max_workers=NUM_WORKERS) as executor:
+      futures = {executor.submit(process_file, wav): wav for wav in wav_files}
       for future in as_completed(futures):
         try:
           future.result()
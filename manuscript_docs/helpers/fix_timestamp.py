@@ -8,8 +8,11 @@ of some files which would otherwise be duplicated.
 import os
 import re
 import logging
+from collections import defaultdict
 from datetime import datetime, timedelta
-from typing import Dict, List
+from typing import DefaultDict, Dict, Iterable, List, Optional, Set, Tuple
+import numba
+import numpy as np
 
 logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
 
@@ -31,109 +34,235 @@ SHORT_CODES: Dict[str, str] = {
   "mex": "mexico"
 }
 
+# Offset for each short code, resolved once instead of per filename
+PREFIX_OFFSET: Dict[str, int] = {
+  short_code: COUNTRY_CONFIG[country]["offset"] for short_code, country in SHORT_CODES.items()
+}
+
+# Filename layout: e.g. mal_D1_20211023_230000.WAV => prefix, site, date and time digits, extension
+FILENAME_PATTERN = re.compile(
+  r"^(?P<prefix>[a-z]{3})_(?P<site>[^_]+)_(\d{4})(\d{2})(\d{2})_(\d{2})(\d{2})(\d{2})(?P<ext>\.wav)$",
+  re.IGNORECASE | re.ASCII
+)
+# Span of the 'YYYYMMDD_HHMMSS' stamp within a matched filename
+STAMP_LENGTH = 15
+# Base filename and optional counter: e.g. ken_D1_20230301_201600 or ken_D1_20230301_201600_1
+FINAL_PATTERN = re.compile(
+  r"^(?P<base>[^_]+_[^_]+_\d{8}_\d{6})(?:_(?P<counter>\d+))?(?P<ext>\.wav)$", re.IGNORECASE
+)
+
+
+def match_timestamp(filename: str) -> Optional[Tuple[re.Match, int]]:
+  """
+  Returns (match, offset) for a filename with a known country prefix, or None if
+  the filename can't be parsed or the short code is unknown.
+  """
+  m = FILENAME_PATTERN.match(filename)
+  if not m:
+    return None  # Can't parse properly, skip
+
+  # Map the 3-letter code straight to its country's offset (lowercase codes need no .lower())
+  prefix = m.group("prefix")
+  offset = PREFIX_OFFSET.get(prefix)
+  if offset is None:
+    offset = PREFIX_OFFSET.get(prefix.lower())
+  if offset is None:
+    return None  # Unknown short code, skip
+
+  return m, offset
+
 
 def correct_timestamp(filename: str) -> str:
   """
   Returns the corrected filename after adjusting the date/time.
   """
-  # Split out parts: e.g. mal_D1_20211023_230000.WAV
-  name_no_ext, ext = os.path.splitext(filename)  # "mal_D1_20211023_230000", ".WAV"
-  parts = name_no_ext.split("_")
-  
-  # Expecting [prefix, site, YYYYMMDD, HHMMSS]
-  if len(parts) != 4:
-    return filename  # Can't parse properly, skip
-  
-  prefix, site_key, date_str, time_str = parts
-  short_code = prefix.lower()  # e.g. "mal"
-
-  # Map the 3-letter code to a country
-  country = SHORT_CODES.get(short_code)
-  if not country:
-    return filename  # Unknown short code, skip
-  
-  offset = COUNTRY_CONFIG[country]["offset"]
-  
+  matched = match_timestamp(filename)
+  if matched is None:
+    return filename
+  m, offset = matched
+  prefix = m.group("prefix")
+
   try:
-    dt_original = datetime.strptime(f"{date_str}{time_str}", "%Y%m%d%H%M%S")
+    dt_original = datetime(*map(int, m.group(3, 4, 5, 6, 7, 8)))
   except ValueError:
     return filename  # Bad format
-  
+
   # Adjust time: subtracting offset hours (e.g. offset=-3 adds 3 hours)
   dt_new = dt_original - timedelta(hours=offset)
-  
-  new_date_str = dt_new.strftime("%Y%m%d")
-  new_time_str = dt_new.strftime("%H%M%S")
-  
-  new_filename = f"{prefix}_{site_key}_{new_date_str}_{new_time_str}{ext}"
+
+  new_date_str = f"{dt_new.year:04d}{dt_new.month:02d}{dt_new.day:02d}"
+  new_time_str = f"{dt_new.hour:02d}{dt_new.minute:02d}{dt_new.second:02d}"
+
+  new_filename = f"{prefix}_{m.group('site')}_{new_date_str}_{new_time_str}{m.group('ext')}"
   return new_filename
 
 
-def main() -> None:
+@numba.njit(cache=True)
+def _days_in_month(year: int, month: int) -> int:
+  if month == 2:
+    return 29 if (year % 4 == 0 and year % 100 != 0) or year % 400 == 0 else 28
+  return 30 if month in (4, 6, 9, 11) else 31
+
+
+@numba.njit(parallel=True, cache=True)
+def _shift_stamps(stamps: np.ndarray, offsets: np.ndarray, valid: np.ndarray) -> None:
+  """
+  For each row of `stamps` (ASCII 'YYYYMMDD_HHMMSS'), subtract offsets[i] hours in
+  place, rolling the day/month/year over as needed. Rows that aren't a valid
+  date and time are left as is and flagged False in `valid`.
+  """
+  for i in numba.prange(stamps.shape[0]):
+    row = stamps[i]
+    year = (row[0]-48)*1000 + (row[1]-48)*100 + (row[2]-48)*10 + (row[3]-48)
+    month = (row[4]-48)*10 + (row[5]-48)
+    day = (row[6]-48)*10 + (row[7]-48)
+    hour = (row[9]-48)*10 + (row[10]-48)
+    minute = (row[11]-48)*10 + (row[12]-48)
+    second = (row[13]-48)*10 + (row[14]-48)
+    if (year < 1 or month < 1 or month > 12 or day < 1 or day > _days_in_month(year, month)
+        or hour > 23 or minute > 59 or second > 59):
+      valid[i] = False
+      continue
+
+    hour -= offsets[i]
+    while hour < 0:
+      hour += 24
+      day -= 1
+      if day < 1:
+        month -= 1
+        if month < 1:
+          month = 12
+          year -= 1
+        day = _days_in_month(year, month)
+    while hour > 23:
+      hour -= 24
+      day += 1
+      if day > _days_in_month(year, month):
+        day = 1
+        month += 1
+        if month > 12:
+          month = 1
+          year += 1
+    if year < 1 or year > 9999:
+      valid[i] = False
+      continue
+
+    row[0] = 48 + year // 1000
+    row[1] = 48 + year // 100 % 10
+    row[2] = 48 + year // 10 % 10
+    row[3] = 48 + year % 10
+    row[4] = 48 + month // 10
+    row[5] = 48 + month % 10
+    row[6] = 48 + day // 10
+    row[7] = 48 + day % 10
+    row[9] = 48 + hour // 10
+    row[10] = 48 + hour % 10
+    valid[i] = True
+
+
+def correct_timestamps(filenames: List[str]) -> List[str]:
+  """
+  Batch version of correct_timestamp. The 'YYYYMMDD_HHMMSS' stamps of all
+  parseable filenames are packed into one byte array and shifted by a numba
+  kernel, then spliced back into the names.
+  """
+  new_filenames = list(filenames)
+  positions, matches, stamps, offsets = [], [], [], []
+  for i, filename in enumerate(filenames):
+    matched = match_timestamp(filename)
+    if matched is None:
+      continue
+    m, offset = matched
+    positions.append(i)
+    matches.append(m)
+    stamps.append(filename[m.start(3):m.start(3) + STAMP_LENGTH])
+    offsets.append(offset)
+  if not positions:
+    return new_filenames
+
+  buf = np.frombuffer("".join(stamps).encode("ascii"), dtype=np.uint8).reshape(-1, STAMP_LENGTH).copy()
+  valid = np.zeros(len(positions), dtype=np.bool_)
+  _shift_stamps(buf, np.array(offsets, dtype=np.int64), valid)
+  new_stamps = buf.tobytes().decode("ascii")
+
+  for k, (i, m) in enumerate(zip(positions, matches)):
+    if valid[k]:
+      start = m.start(3)
+      stamp = new_stamps[k * STAMP_LENGTH:(k + 1) * STAMP_LENGTH]
+      new_filenames[i] = f"{m.string[:start]}{stamp}{m.string[start + STAMP_LENGTH:]}"
+  return new_filenames
+
+
+def main() -> Set[str]:
   """
   Reads all WAV files in FOLDER_PATH, corrects their timestamps, and renames them.
   Avoids filename collisions by appending a counter if necessary.
+  Returns the names in FOLDER_PATH after the renames, for finalise_filenames.
   """
-  for fname in os.listdir(FOLDER_PATH):
-    if fname.lower().endswith(".wav"):
-      old_path = os.path.join(FOLDER_PATH, fname)
-      new_fname = correct_timestamp(fname)
-      
-      if new_fname == fname:
-        continue
-      
-      # Check for collision and append counter if needed.
-      unique_fname = new_fname
-      new_path = os.path.join(FOLDER_PATH, unique_fname)
-      counter = 1
-      while os.path.exists(new_path):
-        name_no_ext, ext = os.path.splitext(new_fname)
-        unique_fname = f"{name_no_ext}_{counter}{ext}"
-        new_path = os.path.join(FOLDER_PATH, unique_fname)
-        counter += 1
-      
-      logging.info(f"Renaming {fname} -> {unique_fname}")
-      os.rename(old_path, new_path)
-
-
-def finalise_filenames() -> None:
+  with os.scandir(FOLDER_PATH) as entries:
+    all_entries = [(entry.name, entry.path) for entry in entries]
+  wav_entries = [(name, path) for name, path in all_entries if name[-4:].lower() == ".wav"]
+  fnames = [fname for fname, _ in wav_entries]
+  # Names currently in the folder, kept in step with each rename for collision checks
+  existing = {name for name, _ in all_entries}
+
+  for (fname, old_path), new_fname in zip(wav_entries, correct_timestamps(fnames)):
+    if new_fname == fname:
+      continue
+
+    # Check for collision and append counter if needed.
+    unique_fname = new_fname
+    counter = 1
+    while unique_fname in existing:
+      name_no_ext, ext = os.path.splitext(new_fname)
+      unique_fname = f"{name_no_ext}_{counter}{ext}"
+      counter += 1
+
+    logging.info(f"Renaming {fname} -> {unique_fname}")
+    os.rename(old_path, os.path.join(FOLDER_PATH, unique_fname))
+    existing.discard(fname)
+    existing.add(unique_fname)
+
+  return existing
+
+
+def finalise_filenames(files: Optional[Iterable[str]] = None) -> None:
   """
   Checks for duplicates (ignoring the counter and extension) and:
   1. Prints a message if duplicates are found.
   2. Removes the counter bit from the filename if there's only one file in that group.
+  files are the names in FOLDER_PATH (as returned by main); the folder is scanned if not given.
   """
-  # Regex to capture base filename and optional counter: e.g. ken_D1_20230301_201600 or ken_D1_20230301_201600_1
-  pattern = re.compile(r"^(?P<base>[^_]+_[^_]+_\d{8}_\d{6})(?:_(?P<counter>\d+))?(?P<ext>\.wav)$", re.IGNORECASE)
-  files = os.listdir(FOLDER_PATH)
-  groups: Dict[str, List[str]] = {}
+  if files is None:
+    with os.scandir(FOLDER_PATH) as entries:
+      files = [entry.name for entry in entries]
+  names = set(files)
 
-  for f in files:
-    if not f.lower().endswith(".wav"):
+  # One pass over the names: match each WAV once and keep the match and path for renaming
+  groups: DefaultDict[str, List[Tuple[re.Match, str]]] = defaultdict(list)
+  for f in names:
+    if f[-4:].lower() != ".wav":
       continue
-    m = pattern.match(f)
+    m = FINAL_PATTERN.match(f)
     if m:
-      base = m.group("base")
-      groups.setdefault(base, []).append(f)
+      groups[m.group("base")].append((m, os.path.join(FOLDER_PATH, f)))
     else:
       logging.warning(f"File does not match expected pattern: {f}")
-  
+
   for base, file_list in groups.items():
     if len(file_list) == 1:
-      f = file_list[0]
-      m = pattern.match(f)
+      m, old_path = file_list[0]
       # If a counter exists, rename to remove it.
-      if m and m.group("counter"):
+      if m.group("counter"):
         new_name = f"{m.group('base')}{m.group('ext')}"
-        old_path = os.path.join(FOLDER_PATH, f)
-        new_path = os.path.join(FOLDER_PATH, new_name)
         # Only rename if the target name doesn't already exist.
-        if not os.path.exists(new_path):
-          #logging.info(f"Removing counter: renaming {f} -> {new_name}")
-          os.rename(old_path, new_path)
+        if new_name not in names:
+          #logging.info(f"Removing counter: renaming {m.string} -> {new_name}")
+          os.rename(old_path, os.path.join(FOLDER_PATH, new_name))
     else:
       logging.info(f"Duplicate group found: {base} has {len(file_list)} files")
 
 
 if __name__ == "__main__":
-  main()
-  finalise_filenames()
+  # Reuse main's view of the folder rather than listing it again
+  finalise_filenames(main())
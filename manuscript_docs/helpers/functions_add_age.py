@@ -12,6 +12,7 @@ import csv
 import logging
 import os
 from pathlib import Path
+import pandas as pd
 from typing import Dict, Tuple
 
 #@title Set Paths
@@ -55,39 +56,46 @@ def add_age_column_to_file(file_path: Path, mapping: Dict[Tuple[str, str], str])
 
   If the site starts with 'R' or 'N', use mapping to add the age; otherwise,
   set age as "NA". Logs a warning if a mapping for an eligible site is not found.
+  The lookup is a single left merge on the (country, site) keys.
 
   Args:
       file_path: Path to the original CSV file.
       mapping: Dictionary mapping (country, site) to age.
   """
   new_file_path = file_path.with_name(file_path.stem + "_age.csv")
-  with file_path.open("r", newline="") as infile, new_file_path.open("w", newline="") as outfile:
-    reader = csv.DictReader(infile)
-    fieldnames = reader.fieldnames + ["age"] if reader.fieldnames else ["age"]
-    writer = csv.DictWriter(outfile, fieldnames=fieldnames)
-    writer.writeheader()
-    for row in reader:
-      site = row["site"].strip()
-      if site.startswith("R") or site.startswith("N"):
-        key = (row["country"].strip().lower(), site.lower())
-        if key in mapping:
-          row["age"] = mapping[key]
-        else:
-          row["age"] = "NA"
-          logging.warning("No age mapping found for country: %s, site: %s", row["country"], row["site"])
-      else:
-        row["age"] = "NA"
-        logging.info("Site %s does not start with 'R' or 'N'. Setting age as NA.", row["site"])
-      writer.writerow(row)
+  # Read every field as the literal string, as csv.DictReader would
+  df = pd.read_csv(file_path, dtype=str, keep_default_na=False)
+
+  site = df["site"].str.strip()
+  eligible = site.str.match(r"[RN]")
+  keys = pd.DataFrame({
+      "country_key": df["country"].str.strip().str.lower(),
+      "site_key": site.str.lower(),
+  })
+  mapping_df = pd.DataFrame(
+      [(country, site_key, age) for (country, site_key), age in mapping.items()],
+      columns=["country_key", "site_key", "age"]
+  )
+  ages = keys.merge(mapping_df, how="left", on=["country_key", "site_key"])["age"]
+
+  unmatched = df.loc[eligible & ages.isna().to_numpy(), ["country", "site"]].drop_duplicates()
+  for country, site_name in unmatched.itertuples(index=False):
+    logging.warning("No age mapping found for country: %s, site: %s", country, site_name)
+  n_ineligible = int((~eligible).sum())
+  if n_ineligible:
+    logging.info("%d rows have a site not starting with 'R' or 'N'. Setting age as NA.", n_ineligible)
+
+  df["age"] = ages.where(eligible.to_numpy(), "NA").fillna("NA").to_numpy()
+  df.to_csv(new_file_path, index=False)
   logging.info("Processed file: %s", file_path.name)
 
 
 
 def main() -> None:
     """Main function to add age column to each CSV file."""
-    age_mapping = load_age_mapping(MAPPING_CSV)
+    age_mapping = load_age_mapping(Path(MAPPING_CSV))
     for filename in FILES:
-        file_path = RESULTS_DIR / filename
+        file_path = Path(RESULTS_DIR) / filename
         if file_path.exists():
             add_age_column_to_file(file_path, age_mapping)
         else:
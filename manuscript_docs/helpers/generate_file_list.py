@@ -1,5 +1,5 @@
 import os
-import pandas as pd
+import csv
 
 # Define paths
 AUDIO_DIR = "/media/bwilliams/New Volume/mars_global_acoustic_study/maldives_acoustics/raw_audio"
@@ -7,12 +7,15 @@ OUTPUT_CSV = "/media/bwilliams/New Volume/mars_global_acoustic_study/maldives_ac
 
 def list_audio_files(directory: str) -> list[str]:
   """Returns a list of all .wav and .WAV files in the given directory."""
-  return [f for f in os.listdir(directory) if f.lower().endswith(".wav")]
+  with os.scandir(directory) as entries:
+    return [entry.name for entry in entries if entry.name.lower().endswith(".wav") and entry.is_file()]
 
 def save_to_csv(file_list: list[str], output_path: str) -> None:
-  """Saves the list of filenames to a CSV file."""
-  df = pd.DataFrame(file_list, columns=["filename"])
-  df.to_csv(output_path, index=False)
+  """Saves the list of filenames to a single-column CSV file."""
+  with open(output_path, "w", newline="") as f:
+    writer = csv.writer(f, lineterminator="\n")
+    writer.writerow(["filename"])
+    writer.writerows([name] for name in file_list)
 
 def main():
   file_list = list_audio_files(AUDIO_DIR)
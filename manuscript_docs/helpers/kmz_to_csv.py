@@ -2,7 +2,6 @@ import zipfile
 import os
 import pandas as pd
 from pathlib import Path
-import shutil
 import xml.etree.ElementTree as ET
 
 BASE_DIR = os.getenv("BASE_DIR")
@@ -14,7 +13,7 @@ CSV_PATH = os.path.join(BASE_DIR, "marrs_acoustics/data/maps/kenya_sites.csv")
 
 def kmz_to_csv_et(kmz_path: str, csv_path: str) -> None:
   """
-  Converts a KMZ file to CSV by extracting KML placemark data using ElementTree.
+  Converts a KMZ file to CSV by streaming KML placemark data out of the archive with ElementTree.
   
   Args:
     kmz_path: Path to the KMZ file.
@@ -22,52 +21,47 @@ def kmz_to_csv_et(kmz_path: str, csv_path: str) -> None:
   """
   kmz_path = Path(kmz_path)
   csv_path = Path(csv_path)
-  
-  # Create a temporary folder to extract files
-  temp_dir = kmz_path.parent / "temp_kmz_extract"
-  temp_dir.mkdir(parents=True, exist_ok=True)
-  
-  # Extract KMZ (ZIP) contents
-  with zipfile.ZipFile(kmz_path, "r") as kmz:
-    kmz.extractall(temp_dir)
-  
-  # Find the KML file
-  kml_file = next(temp_dir.glob("*.kml"), None)
-  if not kml_file:
-    print("No KML file found inside the KMZ.")
-    return
-  
-  # Define KML namespace and parse the KML file
+
+  # Define KML namespace; placemarks are parsed as they stream out of the archive
   ns = {"kml": "http://www.opengis.net/kml/2.2"}
-  tree = ET.parse(kml_file)
-  root = tree.getroot()
-  
+  placemark_tag = f"{{{ns['kml']}}}Placemark"
+
   placemarks = []
-  for placemark in root.findall(".//kml:Placemark", ns):
-    name_elem = placemark.find("kml:name", ns)
-    name = name_elem.text if name_elem is not None else ""
-    point = placemark.find("kml:Point", ns)
-    if point is not None:
-      coords_elem = point.find("kml:coordinates", ns)
-      if coords_elem is not None:
-        coords_text = coords_elem.text.strip()
-        if coords_text:
-          # Coordinates format: lon,lat,alt (altitude is optional)
-          lon, lat, *_ = coords_text.split(",")
-          placemarks.append({
-              "Name": name,
-              "Latitude": lat.strip(),
-              "Longitude": lon.strip()
-          })
-  
+  with zipfile.ZipFile(kmz_path, "r") as kmz:
+    # Find the KML file at the top level of the KMZ (ZIP)
+    kml_name = next((n for n in kmz.namelist() if n.endswith(".kml") and "/" not in n), None)
+    if not kml_name:
+      print("No KML file found inside the KMZ.")
+      return
+
+    with kmz.open(kml_name) as kml_file:
+      for _, placemark in ET.iterparse(kml_file, events=("end",)):
+        if placemark.tag != placemark_tag:
+          continue
+        name_elem = placemark.find("kml:name", ns)
+        name = name_elem.text if name_elem is not None else ""
+        point = placemark.find("kml:Point", ns)
+        if point is not None:
+          coords_elem = point.find("kml:coordinates", ns)
+          if coords_elem is not None:
+            coords_text = coords_elem.text.strip()
+            if coords_text:
+              # Coordinates format: lon,lat,alt (altitude is optional)
+              lon, lat, *_ = coords_text.split(",")
+              placemarks.append({
+                  "Name": name,
+                  "Latitude": lat.strip(),
+                  "Longitude": lon.strip()
+              })
+        # Release the parsed placemark subtree
+        placemark.clear()
+
   if placemarks:
     df = pd.DataFrame(placemarks)
     df.to_csv(csv_path, index=False)
     print(f"Conversion complete! CSV saved at: {csv_path}")
   else:
     print("No placemarks found in the KML file.")
-  
-  shutil.rmtree(temp_dir)
 
 if __name__ == "__main__":
   kmz_to_csv_et(KMZ_PATH, CSV_PATH)
@@ -1,7 +1,7 @@
 """Rename R2-> N1, rename R3 -> R2"""
 import os
 import logging
-from typing import List
+from typing import List, Tuple
 
 # Global constants
 RAW_AUDIO_DIR = "/media/bwilliams/New Volume/marrs_acoustics/mexico_acoustics/raw_audio"
@@ -12,35 +12,28 @@ def rename_files() -> None:
   First pass: Replace files with site code 'R2' with 'N1'.
   Second pass: Replace files with site code 'R3' with 'R2'.
   """
-  # First pass: Replace R2 with N1
-  for filename in os.listdir(RAW_AUDIO_DIR):
-    file_path = os.path.join(RAW_AUDIO_DIR, filename)
-    if not os.path.isfile(file_path) or not filename.upper().endswith(".WAV"):
-      continue
-    parts: List[str] = filename.split("_")
-    if len(parts) < 3:
-      continue
-    if parts[1] == "R2":
-      parts[1] = "N1"
-      new_filename = "_".join(parts)
-      new_path = os.path.join(RAW_AUDIO_DIR, new_filename)
-      logging.info("Renaming '%s' to '%s'", file_path, new_path)
-      os.rename(file_path, new_path)
+  # Scan the folder once, collecting the renames for both passes
+  renames_r2: List[Tuple[str, str]] = []
+  renames_r3: List[Tuple[str, str]] = []
+  with os.scandir(RAW_AUDIO_DIR) as entries:
+    for entry in entries:
+      if not entry.name.upper().endswith(".WAV") or not entry.is_file():
+        continue
+      parts: List[str] = entry.name.split("_")
+      if len(parts) < 3:
+        continue
+      if parts[1] == "R2":
+        parts[1] = "N1"
+        renames_r2.append((entry.path, "_".join(parts)))
+      elif parts[1] == "R3":
+        parts[1] = "R2"
+        renames_r3.append((entry.path, "_".join(parts)))
 
-  # Second pass: Replace R3 with R2
-  for filename in os.listdir(RAW_AUDIO_DIR):
-    file_path = os.path.join(RAW_AUDIO_DIR, filename)
-    if not os.path.isfile(file_path) or not filename.upper().endswith(".WAV"):
-      continue
-    parts = filename.split("_")
-    if len(parts) < 3:
-      continue
-    if parts[1] == "R3":
-      parts[1] = "R2"
-      new_filename = "_".join(parts)
-      new_path = os.path.join(RAW_AUDIO_DIR, new_filename)
-      logging.info("Renaming '%s' to '%s'", file_path, new_path)
-      os.rename(file_path, new_path)
+  # First pass: Replace R2 with N1, then second pass: Replace R3 with R2
+  for file_path, new_filename in renames_r2 + renames_r3:
+    new_path = os.path.join(RAW_AUDIO_DIR, new_filename)
+    logging.info("Renaming '%s' to '%s'", file_path, new_path)
+    os.rename(file_path, new_path)
 
 if __name__ == "__main__":
   logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
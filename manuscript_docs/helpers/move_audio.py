@@ -7,15 +7,15 @@ from typing import List
 BASE_PATH = r'E:\mexico_acoustics'
 RAW_AUDIO_DIR = os.path.join(BASE_PATH, 'raw_audio')
 
+AUDIO_SUFFIXES = ('.wav', '.WAV')  # Add other audio file extensions if needed
+
 def get_audio_files_in_subdirectories(base_path: str, exclude_dir: str) -> List[str]:
     """Returns a list of audio files in subdirectories, excluding the given directory."""
     audio_files = []
-    for root, _, files in os.walk(base_path):
-        if root.startswith(exclude_dir):
-            continue
-        for file in files:
-            if file.lower().endswith(('.wav')):  # Add other audio file extensions if needed
-                audio_files.append(os.path.join(root, file))
+    for root, dirs, files in os.walk(base_path, followlinks=False):
+        # Prune the excluded directory so the walk never descends into it
+        dirs[:] = [d for d in dirs if not os.path.join(root, d).startswith(exclude_dir)]
+        audio_files.extend(os.path.join(root, file) for file in files if file.endswith(AUDIO_SUFFIXES))
     return audio_files
 
 def move_files_to_directory(files: List[str], destination_dir: str):
@@ -13,19 +13,20 @@ def move_audio_files() -> None:
   Only directories (other than raw_audio) are processed. If a file already exists in
   raw_audio, it is skipped.
   """
-  for entry in os.listdir(BASE_DIR):
-    entry_path = os.path.join(BASE_DIR, entry)
+  with os.scandir(BASE_DIR) as entries:
     # Only process directories excluding raw_audio
-    if os.path.isdir(entry_path) and entry != "raw_audio":
-      for filename in os.listdir(entry_path):
-        if filename.upper().endswith(".WAV"):
-          source_path = os.path.join(entry_path, filename)
-          dest_path = os.path.join(RAW_AUDIO_DIR, filename)
-          if os.path.exists(dest_path):
-            logging.warning("File %s already exists in raw_audio. Skipping.", filename)
-            continue
-          logging.info("Moving '%s' to '%s'", source_path, dest_path)
-          shutil.move(source_path, dest_path)
+    subdirs = [entry.path for entry in entries if entry.name != "raw_audio" and entry.is_dir()]
+
+  for subdir in subdirs:
+    with os.scandir(subdir) as files:
+      sources = [(f.name, f.path) for f in files if f.name.upper().endswith(".WAV")]
+    for filename, source_path in sources:
+      dest_path = os.path.join(RAW_AUDIO_DIR, filename)
+      if os.path.exists(dest_path):
+        logging.warning("File %s already exists in raw_audio. Skipping.", filename)
+        continue
+      logging.info("Moving '%s' to '%s'", source_path, dest_path)
+      shutil.move(source_path, dest_path)
 
 if __name__ == "__main__":
   logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -8,16 +8,23 @@ Overview:
    - Perform the same daily coverage check (exclude entire days if <90%).
      => We keep the hour detail in the final output, but coverage is still daily-based.
 2. In agile_outputs, for each subfolder (sound) except "snap", load rows (logit >= 1.0),
-   parse site/date/hour/treatment, and store presence of that sound for that hour.
-3. Group by (country, site, date, hour, treatment), counting unique sounds => 'phonic richness'.
-4. Merge with the coverage-passing combos from step (1) (left join), fill missing with 0.
-5. Save everything as phonic_richness_hourly.csv.
+   look up site/date/hour/treatment from step (1), and note the hours that sound is present.
+3. For each coverage-passing (country, site, date, hour, treatment), count the unique
+   sounds present => 'phonic richness' (0 if none).
+4. Save everything as phonic_richness_hourly.csv (plus .parquet with --parquet).
 """
 
 import os
+import argparse
 import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+import numpy as np
 import pandas as pd
-from datetime import datetime
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
 
 # We'll still import some shared constants/functions from elsewhere, but
 # remove any offset usage now that the source data is fixed.
@@ -26,8 +33,11 @@ from count_ecofunctions import (
     COUNTRY_CONFIG,     # We'll still use duty_cycle for coverage, no offset needed
     FILE_COVERAGE,      # e.g. 0.9
     LOGIT_CUTOFF,       # e.g. 1.0
-    parse_treatment,
-    parse_site,
+    parse_all,
+    decimal_hours,
+    read_raw_filename_parts,
+    read_inference,
+    list_sound_folders,
 )
 
 OUTPUT_RICHNESS_HOURLY_PATH = os.path.join(
@@ -35,15 +45,34 @@ OUTPUT_RICHNESS_HOURLY_PATH = os.path.join(
     "marrs_acoustics/data/results/functions",
     "phonic_richness_hourly.csv"
 )
+NUM_SOUND_WORKERS = 8  # Sound folders read concurrently within each country
+# Key of an hour id; country is constant within a country's run, so it's left out
+HOUR_KEYS = ["site", "date", "hour", "treatment"]
 
-def parse_filename_datetime(filename_part: str) -> datetime:
+def parse_filenames_hourly(filename_parts: pd.Series, country: str) -> pd.DataFrame:
   """
-  Parse the full datetime (with hours, minutes, seconds) from the filename,
-  with NO offset adjustment now.
-  Example: 'ind_D2_20220830_130600.WAV' => 2022-08-30 13:06:00
+  Vectorized parse of a Series of filename parts (no directory).
+  Return a DataFrame with columns: country, site, date, hour, treatment (same index as the input).
+  Columns are built straight from the parsed arrays; date is an int32 YYYYMMDD
+  key and hour is stored as int8.
   """
-  dt_str = filename_part[7:7+15]  # e.g. '20220830_130600'
-  return datetime.strptime(dt_str, "%Y%m%d_%H%M%S")
+  names = filename_parts.to_numpy()
+  # Time of day from the compiled filename kernel, truncated to the hour
+  hours = decimal_hours(names)
+  if np.isnan(hours).any():
+    bad = names[np.isnan(hours)][0]
+    raise ValueError(f"Cannot parse datetime from filename: {bad}")
+  sites, dates, treatments = parse_all(names)
+  return pd.DataFrame(
+    {
+      "country": country,
+      "site": sites,
+      "date": dates.astype(np.int32),  # YYYYMMDD as an integer key
+      "hour": hours.astype(np.int8),  # integer hour 0..23
+      "treatment": treatments,
+    },
+    index=filename_parts.index
+  )
 
 def get_expected_daily_recordings(duty_cycle: int) -> int:
   """
@@ -52,12 +81,13 @@ def get_expected_daily_recordings(duty_cycle: int) -> int:
   minutes_per_day = 24 * 60
   return int(minutes_per_day / duty_cycle)
 
-def load_raw_file_list_hourly(country: str) -> pd.DataFrame:
+def load_valid_filenames_hourly(country: str) -> pd.DataFrame:
   """
   1) Load raw_file_list.csv for the country.
   2) Parse the datetime => (date, hour), plus site, treatment (no offset).
   3) Do daily coverage check (exclude entire day if coverage < 90%).
-  4) Return DataFrame with (country, site, date, hour, treatment) for coverage-passing days.
+  4) Return DataFrame of (country, site, date, hour, treatment) indexed by filename
+     part, one row per file on a coverage-passing day.
   """
   raw_list_path = os.path.join(
     BASE_DIR,
@@ -68,68 +98,81 @@ def load_raw_file_list_hourly(country: str) -> pd.DataFrame:
 
   if not os.path.isfile(raw_list_path):
     logging.warning(f"raw_file_list.csv not found for {country}: {raw_list_path}")
-    return pd.DataFrame(columns=["country", "site", "date", "hour", "treatment"])
-
-  df_raw = pd.read_csv(raw_list_path)
-
-  # Build up rows
-  raw_rows = []
-  for _, row in df_raw.iterrows():
-    filename_full = row["filename"]
-    filename_part = filename_full.split("/", 1)[-1] if "/" in filename_full else filename_full
-
-    dt_parsed = parse_filename_datetime(filename_part)
-    date_str = dt_parsed.strftime("%Y%m%d")
-    hour_val = dt_parsed.hour  # integer hour 0..23
-
-    treatment = parse_treatment(filename_part)
-    site = parse_site(filename_part)
+    return pd.DataFrame(
+      columns=["country", "site", "date", "hour", "treatment"], index=pd.Index([], name="filename_part")
+    )
 
-    raw_rows.append((country, site, date_str, hour_val, treatment))
+  # Only the filename column is needed (pyarrow's multithreaded CSV reader, directory stripped in Arrow)
+  filename_parts = read_raw_filename_parts(raw_list_path)
 
-  df_out = pd.DataFrame(raw_rows, columns=["country", "site", "date", "hour", "treatment"])
+  # Parse the whole filename column at once
+  df_out = parse_filenames_hourly(filename_parts, country)
 
-  # Daily coverage check => count files per site–date
-  df_daily_counts = (
-    df_out.groupby(["site", "date"])
-    .size()
-    .reset_index(name="n_files")
-  )
+  # Daily coverage check => factorize site–date once and count files per day
+  day_codes, days = pd.MultiIndex.from_arrays([df_out["site"], df_out["date"]]).factorize()
+  n_files = np.bincount(day_codes, minlength=len(days))
 
   duty_cycle = COUNTRY_CONFIG[country]["duty_cycle"]
   expected_daily = get_expected_daily_recordings(duty_cycle)
   coverage_threshold = FILE_COVERAGE * expected_daily
+  passing_days = n_files >= coverage_threshold
 
   # Exclude days under coverage threshold
-  insufficient = df_daily_counts[df_daily_counts["n_files"] < coverage_threshold]
-  if not insufficient.empty:
-    for _, row_ex in insufficient.iterrows():
-      logging.info(
-        f"Excluding entire day for {country}, site={row_ex['site']}, date={row_ex['date']} "
-        f"(only {row_ex['n_files']} of {expected_daily} expected)"
-      )
-
-  df_daily_counts = df_daily_counts[df_daily_counts["n_files"] >= coverage_threshold]
-
-  # Keep only hours from coverage-passing days
-  df_valid = pd.merge(
-    df_out,
-    df_daily_counts[["site", "date"]],
-    on=["site", "date"],
-    how="inner"
+  insufficient = (
+    days[~passing_days].to_frame(index=False, name=["site", "date"])
+    .assign(n_files=n_files[~passing_days])
+    .sort_values(["site", "date"])
   )
+  for row_ex in insufficient.itertuples(index=False):
+    logging.info(
+      f"Excluding entire day for {country}, site={row_ex.site}, date={row_ex.date} "
+      f"(only {row_ex.n_files} of {expected_daily} expected)"
+    )
 
-  df_valid.drop_duplicates(inplace=True)
-  return df_valid
+  # Keep only files from coverage-passing days: a per-day lookup by each row's code
+  keep = passing_days[day_codes]
+  df_valid = df_out[keep].set_index(pd.Index(filename_parts[keep], name="filename_part"))
+  df_valid = df_valid[~df_valid.index.duplicated()]
 
-def gather_sound_presence_hourly(country: str, logit_cutoff: float = 1.0) -> pd.DataFrame:
+  # Low-cardinality keys => categorical codes for cheaper hashing in drop_duplicates/merge
+  return df_valid.astype({col: "category" for col in ["country", "site", "treatment"]})
+
+def load_sound_hours(
+  csv_path: str, logit_cutoff: float, filename_hours: pd.Series, hours: pd.MultiIndex, country: str
+) -> np.ndarray:
+  """
+  Read one sound's inference CSV (rows with logit >= cutoff) and return the distinct
+  hour ids (values of `filename_hours`, indexed by filename part) it was detected in.
+  Filenames not in `filename_hours` (on a coverage-failed day, or missing from the
+  raw file list) are parsed and looked up in `hours`, the (site, date, hour,
+  treatment) of each hour id; those outside a coverage-passing hour are dropped.
   """
-  Look in agile_outputs/<sound> for each subfolder except 'snap'.
-  If <sound>_inference.csv exists, parse rows with logit >= cutoff.
-  Then parse date, hour, site, treatment => this sound is present that hour.
-  Return DataFrame of [country, site, date, hour, treatment, sound].
+  # Read with pyarrow (logit as float32), rows with logit >= cutoff only;
+  # only the filename part is needed here, so nothing else reaches pandas
+  df_infer = read_inference(csv_path, logit_cutoff, columns=["filename_part"])
+  filename_parts = df_infer["filename_part"]
+
+  # Probe the index's hash table, built once per country and shared by every sound
+  positions = filename_hours.index.get_indexer(filename_parts)
+  found = positions >= 0
+  hour_ids = filename_hours.to_numpy()[positions[found]]
+  if not found.all():
+    df_parsed = parse_filenames_hourly(pd.Series(filename_parts[~found].unique()), country)
+    extra_ids = hours.get_indexer(pd.MultiIndex.from_frame(df_parsed[HOUR_KEYS]))
+    hour_ids = np.concatenate([hour_ids, extra_ids[extra_ids >= 0]])
+  return np.unique(hour_ids)
+
+def count_sounds_per_hour(
+  country: str, logit_cutoff: float, filename_hours: pd.Series, hours: pd.MultiIndex
+) -> np.ndarray:
   """
-  presence_rows = []
+  Look in agile_outputs/<sound> for each subfolder except 'snap', and count for
+  each hour id (position in `hours`) how many sounds were detected in it.
+  Each sound contributes at most once per hour, so only a running count per hour
+  is kept rather than a row per detection. Sound folders are read on a thread
+  pool (pyarrow parses CSVs without the GIL).
+  """
+  counts = np.zeros(len(hours), dtype=np.int64)
   country_agile_dir = os.path.join(
     BASE_DIR,
     "marrs_acoustics/data",
@@ -138,103 +181,94 @@ def gather_sound_presence_hourly(country: str, logit_cutoff: float = 1.0) -> pd.
   )
   if not os.path.isdir(country_agile_dir):
     logging.warning(f"No agile_outputs directory for {country}: {country_agile_dir}")
-    return pd.DataFrame(columns=["country", "site", "date", "hour", "treatment", "sound"])
-
-  for sound_folder in os.listdir(country_agile_dir):
-    folder_path = os.path.join(country_agile_dir, sound_folder)
-    if not os.path.isdir(folder_path):
-      continue
+    return counts
 
+  csv_paths = []
+  for sound_folder in list_sound_folders(country_agile_dir):
     # skip if the folder is snap
     if sound_folder.lower() == "snap":
       logging.info(f"Not using: {sound_folder}")
       continue
-
-    csv_path = os.path.join(folder_path, f"{sound_folder}_inference.csv")
-    if not os.path.isfile(csv_path):
-      logging.info(f"Not using: {sound_folder} (no CSV found).")
-      continue
-
     logging.info(f"Using: {sound_folder}")
-    df_infer = pd.read_csv(csv_path)
-
-    # Filter rows with logit >= cutoff
-    if " logit" in df_infer.columns:
-      df_infer = df_infer[df_infer[" logit"] >= logit_cutoff]
-    else:
-      df_infer = df_infer[df_infer["logit"] >= logit_cutoff]
-
-    for _, row_inf in df_infer.iterrows():
-      filename_full = row_inf["filename"]
-      filename_part = filename_full.split("/", 1)[-1] if "/" in filename_full else filename_full
-
-      dt_parsed = parse_filename_datetime(filename_part)
-      date_str = dt_parsed.strftime("%Y%m%d")
-      hour_val = dt_parsed.hour
-
-      treatment = parse_treatment(filename_part)
-      site = parse_site(filename_part)
-
-      presence_rows.append(
-        (country, site, date_str, hour_val, treatment, sound_folder)
-      )
-
-  df_presence = pd.DataFrame(
-    presence_rows,
-    columns=["country", "site", "date", "hour", "treatment", "sound"]
-  )
-  return df_presence
+    csv_paths.append(os.path.join(country_agile_dir, sound_folder, f"{sound_folder}_inference.csv"))
+  with ThreadPoolExecutor(max_workers=NUM_SOUND_WORKERS) as executor:
+    worker = partial(
+      load_sound_hours, logit_cutoff=logit_cutoff, filename_hours=filename_hours,
+      hours=hours, country=country
+    )
+    for sound_hours in executor.map(worker, csv_paths):
+      counts[sound_hours] += 1
+  return counts
 
 def process_country_phonic_richness_hourly(country: str, logit_cutoff: float) -> pd.DataFrame:
   """
-  1) Load coverage-passing combos with hour detail => (country, site, date, hour, treatment).
-  2) gather_sound_presence_hourly => (country, site, date, hour, treatment, sound).
-  3) Group by these keys, counting unique sounds => 'count'.
-  4) Left-merge with coverage combos so we only keep valid coverage days/hours.
+  1) Load coverage-passing files with hour detail => (country, site, date, hour, treatment).
+  2) Number the distinct (site, date, hour, treatment) combos => hour ids.
+  3) count_sounds_per_hour => number of unique sounds per hour id => 'count'
+     (0 where no sound was detected).
   """
-  df_coverage = load_raw_file_list_hourly(country)
-  df_presence = gather_sound_presence_hourly(country, logit_cutoff)
-
-  if df_presence.empty:
-    # No sounds => set count=0 for coverage combos
-    df_presence_count = pd.DataFrame(
-      columns=["country", "site", "date", "hour", "treatment", "count"]
-    )
-  else:
-    df_presence_count = (
-      df_presence
-      .groupby(["country", "site", "date", "hour", "treatment"], as_index=False)["sound"]
-      .nunique()
-      .rename(columns={"sound": "count"})
-    )
-
-  df_out = pd.merge(
-    df_coverage,
-    df_presence_count,
-    how="left",
-    on=["country", "site", "date", "hour", "treatment"]
-  )
-  df_out["count"] = df_out["count"].fillna(0).astype(int)
-
+  logging.info(f"Processing hourly phonic richness for {country}...")
+  # Parse the raw file list once; inference rows are looked up in it rather than re-parsed
+  valid_filenames = load_valid_filenames_hourly(country)
+  # Lookups need unique filenames; checking also builds the index's hash table
+  # here, once, before the sound threads share it
+  if not valid_filenames.index.is_unique:
+    raise ValueError(f"Duplicate filenames in the raw file list index for {country}")
+
+  # country is constant here, so only the other four keys need hashing
+  hour_ids, hours = pd.MultiIndex.from_frame(valid_filenames[HOUR_KEYS]).factorize()
+  filename_hours = pd.Series(hour_ids, index=valid_filenames.index)
+
+  # Take each hour's first row rather than hours.to_frame(), which would widen the
+  # int32 date / int8 hour keys and decode the categoricals
+  _, first_rows = np.unique(hour_ids, return_index=True)
+  df_out = valid_filenames.iloc[first_rows].reset_index(drop=True)
+  counts = count_sounds_per_hour(country, logit_cutoff, filename_hours, hours)
+  df_out["count"] = counts.astype(np.int16)  # at most one per sound folder
   return df_out
 
 def main() -> None:
   """
-  Build 'phonic richness' DataFrame per hour for all countries, then save.
+  Build 'phonic richness' DataFrame per hour for all countries, then save to
+  OUTPUT_RICHNESS_HOURLY_PATH (and to a Parquet file alongside it if --parquet is given).
   """
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+  parser.add_argument("--parquet", action="store_true", help="Also write the output as Parquet.")
+  args = parser.parse_args()
   logging.basicConfig(level=logging.INFO)
 
   countries = list(COUNTRY_CONFIG.keys())
-  combined_df = pd.DataFrame(columns=["country", "site", "date", "hour", "treatment", "count"])
 
-  for country in countries:
-    logging.info(f"Processing hourly phonic richness for {country}...")
-    df_country = process_country_phonic_richness_hourly(country, LOGIT_CUTOFF)
-    combined_df = pd.concat([combined_df, df_country], ignore_index=True)
-
-  combined_df.sort_values(["country", "treatment", "site", "date", "hour"], inplace=True)
-  combined_df.to_csv(OUTPUT_RICHNESS_HOURLY_PATH, index=False)
+  # Countries are independent, so process them in parallel and concatenate once.
+  # Empty frames (no raw file list) carry object columns and would force them
+  # onto the combined result.
+  with ProcessPoolExecutor(max_workers=len(countries)) as executor:
+    worker = partial(process_country_phonic_richness_hourly, logit_cutoff=LOGIT_CUTOFF)
+    frames = [df for df in executor.map(worker, countries) if not df.empty]
+  if not frames:
+    frames.append(pd.DataFrame(columns=["country", "site", "date", "hour", "treatment", "count"]))
+  combined_df = pd.concat(frames, ignore_index=True)
+  # Categories differ per country, so plain strings are the common type for the
+  # combined key columns (and sort as text in Arrow)
+  for col in ["country", "site", "treatment"]:
+    combined_df[col] = combined_df[col].astype(str)
+
+  # Sort in Arrow with one multi-key sort_indices + take, then write with
+  # pyarrow's C++ CSV writer. Nothing is quoted, matching DataFrame.to_csv output;
+  # the writer always quotes its own header, so the header line is written here.
+  table = pa.Table.from_pandas(combined_df, preserve_index=False)
+  sort_keys = [(col, "ascending") for col in ["country", "treatment", "site", "date", "hour"]]
+  table = table.take(pc.sort_indices(table, sort_keys=sort_keys))
+  with open(OUTPUT_RICHNESS_HOURLY_PATH, "wb") as f:
+    f.write((",".join(table.column_names) + "\n").encode())
+    pacsv.write_csv(
+      table, f, write_options=pacsv.WriteOptions(include_header=False, quoting_style="none")
+    )
   logging.info(f"Saved hourly phonic richness to {OUTPUT_RICHNESS_HOURLY_PATH}")
+  if args.parquet:
+    parquet_path = OUTPUT_RICHNESS_HOURLY_PATH.replace(".csv", ".parquet")
+    pq.write_table(table, parquet_path, compression="zstd")
+    logging.info(f"Saved hourly phonic richness to {parquet_path}")
 
 if __name__ == "__main__":
   main()
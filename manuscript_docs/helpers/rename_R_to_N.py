@@ -5,20 +5,35 @@ where N was used to denote newly restored sites.
 """
 
 import os
+from concurrent.futures import ThreadPoolExecutor
 from tqdm import tqdm
 
 folder_path = "/media/bwilliams/New Volume/mars_global_acoustic_study/kenya_acoustics/raw_audio"
+NUM_WORKERS = 32  # Concurrent rename calls
 
 def rename_files(folder_path: str) -> None:
     try:
-        files = [f for f in os.listdir(folder_path) if f.endswith(".WAV")]
-        for filename in tqdm(files, desc="Renaming Files", unit="file"):
+        with os.scandir(folder_path) as it:
+            entries = [e for e in it if e.name.endswith(".WAV") and e.is_file()]
+        pairs = []
+        for entry in entries:
+            filename = entry.name
             if len(filename) > 4 and filename[4] == 'R':
                 # Rename by replacing 'R' with 'N'
                 new_filename = filename[:4] + 'N' + filename[5:]
-                old_file_path = os.path.join(folder_path, filename)
-                new_file_path = os.path.join(folder_path, new_filename)
-                os.rename(old_file_path, new_file_path)
+                pairs.append((filename, new_filename))
+        # Rename relative to one open directory fd so the folder path is resolved once,
+        # with renames issued concurrently to keep the (external) drive's queue busy
+        dfd = os.open(folder_path, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            with ThreadPoolExecutor(max_workers=NUM_WORKERS) as executor:
+                renames = executor.map(
+                    lambda pair: os.rename(*pair, src_dir_fd=dfd, dst_dir_fd=dfd), pairs
+                )
+                for _ in tqdm(renames, total=len(pairs), desc="Renaming Files", unit="file"):
+                    pass
+        finally:
+            os.close(dfd)
     except Exception as e:
         print(f"Error: {e}")
 
@@ -2,10 +2,12 @@
 
 import os
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict
 
 # Global constants
 BASE_DIR = "/media/bwilliams/New Volume/marrs_acoustics/indonesia_acoustics/raw_audio"
+NUM_WORKERS = 32  # Concurrent rename calls
 
 # Site mapping to two-character codes
 TWO_CHAR_SITE_MAPPING: Dict[str, str] = {
@@ -34,26 +36,34 @@ TWO_CHAR_SITE_MAPPING: Dict[str, str] = {
 
 def rename_audio_files() -> None:
   """Rename audio files by adding a site-specific prefix."""
-  for site_dir in os.listdir(BASE_DIR):
-    site_path = os.path.join(BASE_DIR, site_dir)
-    if not os.path.isdir(site_path):
-      continue
+  with os.scandir(BASE_DIR) as site_entries:
+    site_dirs = [e for e in site_entries if e.is_dir()]
+  for site_entry in site_dirs:
+    site_dir = site_entry.name
     site_code = TWO_CHAR_SITE_MAPPING.get(site_dir)
     if not site_code:
       logging.warning("No mapping for site: %s", site_dir)
       continue
     prefix = f"ind_{site_code}_"
-    for filename in os.listdir(site_path):
-      file_path = os.path.join(site_path, filename)
-      if not os.path.isfile(file_path):
-        continue
+    with os.scandir(site_entry.path) as file_entries:
+      files = [e for e in file_entries if e.is_file()]
+    pairs = []
+    for file_entry in files:
+      filename = file_entry.name
       # Skip if already renamed
       if filename.startswith(prefix):
         continue
       new_name = prefix + filename
-      new_path = os.path.join(site_path, new_name)
-      logging.info("Renaming '%s' to '%s'", file_path, new_path)
-      os.rename(file_path, new_path)
+      logging.info("Renaming '%s' to '%s'", file_entry.path, new_name)
+      pairs.append((filename, new_name))
+    # Rename relative to one open directory fd so the site path is resolved once,
+    # with renames issued concurrently to keep the (external) drive's queue busy
+    dfd = os.open(site_entry.path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+      with ThreadPoolExecutor(max_workers=NUM_WORKERS) as executor:
+        list(executor.map(lambda pair: os.rename(*pair, src_dir_fd=dfd, dst_dir_fd=dfd), pairs))
+    finally:
+      os.close(dfd)
 
 if __name__ == "__main__":
   logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -43,22 +43,21 @@ OUTPUT_SHANNON_PATH = os.path.join(
   "shannon_index.csv"
 )
 
+# Treatment code found at the 5th character of each filename.
+TREATMENT_CODES = {
+  "H": "healthy",
+  "D": "degraded",
+  "R": "restored",
+  "N": "newly_restored"
+}
+
 def parse_treatment(filename_part: str) -> str:
   """
   Same as before: uses filename_part[4] to determine H/D/R/N.
   """
   if len(filename_part) <= 4:
     return "unknown"
-  char = filename_part[4]
-  if char == "H":
-    return "healthy"
-  if char == "D":
-    return "degraded"
-  if char == "R":
-    return "restored"
-  if char == "N":
-    return "newly_restored"
-  return "unknown"
+  return TREATMENT_CODES.get(filename_part[4], "unknown")
 
 def parse_site(filename_part: str) -> str:
   """
@@ -98,9 +97,9 @@ def load_raw_file_list(country: str) -> pd.DataFrame:
 
   df_raw = pd.read_csv(raw_list_path)
   rows = []
-  for _, row_csv in df_raw.iterrows():
-    filename_full = row_csv["filename"]
-    filename_part = filename_full.split("/", 1)[-1] if "/" in filename_full else filename_full
+  # Plain tuples rather than a Series per row
+  for (filename_full,) in df_raw[["filename"]].itertuples(index=False, name=None):
+    filename_part = filename_full.rpartition("/")[2]  # basename (whole string if no "/")
 
     date_str = parse_date(filename_part)
     site = parse_site(filename_part)
@@ -119,10 +118,10 @@ def load_raw_file_list(country: str) -> pd.DataFrame:
   # Exclude days < coverage threshold
   insufficient = df_counts[df_counts["n_files"] < coverage_threshold]
   if not insufficient.empty:
-    for _, row_ex in insufficient.iterrows():
+    for row_ex in insufficient.itertuples(index=False):
       logging.info(
-        f"Excluding {country}, site={row_ex['site']}, date={row_ex['date']} "
-        f"(only {row_ex['n_files']} of {expected_daily} expected)"
+        f"Excluding {country}, site={row_ex.site}, date={row_ex.date} "
+        f"(only {row_ex.n_files} of {expected_daily} expected)"
       )
   df_counts = df_counts[df_counts["n_files"] >= coverage_threshold]
 
@@ -168,17 +167,18 @@ def gather_sound_counts(country: str, logit_cutoff: float = 1.0) -> pd.DataFrame
       continue
 
     logging.info(f"Using sound '{sound_folder}' for {country}.")
-    df_infer = pd.read_csv(csv_path)
+    # Only filename + logit are needed. The logit column is written as " logit"
+    # (leading space) by the inference step, so normalize the names on read.
+    df_infer = pd.read_csv(csv_path, usecols=lambda col: col.strip() in ("filename", "logit"))
+    df_infer.columns = df_infer.columns.str.strip()
 
     # Filter by logit
-    col_logit = " logit" if " logit" in df_infer.columns else "logit"
-    df_infer = df_infer[df_infer[col_logit] >= logit_cutoff]
+    df_infer = df_infer[df_infer["logit"] >= logit_cutoff]
 
     # For each valid row, parse
     rows_infer = []
-    for _, row_inf in df_infer.iterrows():
-      filename_full = row_inf["filename"]
-      filename_part = filename_full.split("/", 1)[-1] if "/" in filename_full else filename_full
+    for (filename_full,) in df_infer[["filename"]].itertuples(index=False, name=None):
+      filename_part = filename_full.rpartition("/")[2]  # basename (whole string if no "/")
 
       date_str = parse_date(filename_part)
       site = parse_site(filename_part)